@@ -2,6 +2,7 @@ from flask import Flask, request, jsonify
 import pickle
 import pandas as pd
 import numpy as np
+from edupath import discovery
 
 app = Flask(__name__)
 model = None
@@ -35,5 +36,11 @@ def predict():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route('/health', methods=['GET'])
+def health():
+    # Consul health check
+    return jsonify({"status": "ok", "model_loaded": model is not None})
+
 if __name__ == '__main__':
+    discovery.register_in_background("path-predictor", 5002, check_path="/health")
     app.run(host='0.0.0.0', port=5002)
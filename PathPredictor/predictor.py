@@ -1,28 +1,17 @@
-import pandas as pd
-from sqlalchemy import create_engine
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 import mlflow
 import mlflow.xgboost
 import pickle
-
-# DB Config
-DB_USER = 'admin'
-DB_PASS = 'adminpassword'
-DB_HOST = '127.0.0.1'
-DB_PORT = '5433'
-DB_NAME = 'edupath_db'
-DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+from edupath import db
 
 def train_model():
     print("Starting PathPredictor Training...")
-    engine = create_engine(DATABASE_URI)
-    
     # Load Data (Join analytics with profiles for labels/features)
     # Target: Let's assume 'risk_factor' >= 0.5 is 'At Risk' (Binary Classification)
     # We want to predict if a student IS at risk.
-    df = pd.read_sql("SELECT * FROM student_analytics", engine)
+    df = db.fetch_frame("SELECT avg_score, total_actions, total_time, risk_factor FROM student_analytics")
     
     if df.empty:
         print("No training data found.")
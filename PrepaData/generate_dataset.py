@@ -1,26 +1,16 @@
 import os
 import random
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from faker import Faker
 from datetime import datetime, timedelta
-
-# Configuration
-DB_USER = os.getenv('POSTGRES_USER', 'admin')
-DB_PASS = os.getenv('POSTGRES_PASSWORD', 'adminpassword')
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-# If running on localhost (default), use mapped port 5433. If inside docker (hostname 'postgres'), use 5432.
-default_port = '5433' if DB_HOST == 'localhost' else '5432'
-DB_PORT = os.getenv('DB_PORT', default_port)
-DB_NAME = os.getenv('POSTGRES_DB', 'edupath_db')
-
-DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+from edupath import db
 
 fake = Faker()
 
 def get_engine():
     try:
-        engine = create_engine(DATABASE_URI)
+        engine = db.get_engine()
         return engine
     except Exception as e:
         print(f"Error connecting to DB: {e}")
@@ -6,9 +6,7 @@ from unittest.mock import MagicMock, patch
 # Add parent directory to path so we can import etl
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# Mock SQLAlchemy engine
-sys.modules['sqlalchemy'] = MagicMock()
-sys.modules['sqlalchemy'].create_engine = MagicMock()
+from edupath import db
 
 # Mock data
 mock_logs = pd.DataFrame({
@@ -20,11 +18,11 @@ mock_logs = pd.DataFrame({
 })
 
 mock_students = pd.DataFrame({
-    'student_id': range(1, 6),
+    'id': range(1, 6),
     'email': [f'student{i}@test.com' for i in range(1, 6)]
 })
 
-def mock_read_sql(query, con):
+def mock_fetch_frame(query, params=None, engine=None, arrow=False):
     if "student_logs" in query:
         return mock_logs
     elif "students" in query:
@@ -35,8 +33,8 @@ def mock_to_sql(self, name, con, if_exists, index):
     print(f"\n[Mock to_sql] Writing to table '{name}':")
     print(self)
 
-# Patch pandas
-with patch('pandas.read_sql', side_effect=mock_read_sql):
+# Patch the DB layer and pandas
+with patch.object(db, 'get_engine', MagicMock()), patch.object(db, 'fetch_frame', side_effect=mock_fetch_frame):
     with patch('pandas.DataFrame.to_sql', mock_to_sql):
         import etl  # Import your script here
         
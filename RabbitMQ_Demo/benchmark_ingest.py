@@ -0,0 +1,93 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import pika
+import psycopg2
+
+import consumer
+
+# Ingestion throughput at several batch sizes, against a local RabbitMQ + Postgres:
+#   python benchmark_ingest.py --events 20000 --batch-sizes 1 10 100 500 1000
+# Each run fills a scratch queue with the same synthetic events, then times the worker draining it
+# into a scratch table (never student_logs) and checks that every event landed exactly once.
+
+BENCH_QUEUE = consumer.QUEUE + '.bench'
+BENCH_TABLE = 'student_logs_bench'
+ACTIVITIES = ['view_course', 'take_quiz', 'submit_assignment', 'forum_post']
+
+def synthetic_events(n, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [json.dumps({
+        'student_id': rng.randint(1, 1000),
+        'activity_type': rng.choice(ACTIVITIES),
+        'score': rng.randint(0, 100),
+        'duration_seconds': rng.randint(30, 3600),
+        'timestamp': (start + timedelta(seconds=i)).isoformat(),
+    }).encode() for i in range(n)]
+
+def fill_queue(events):
+    connection = pika.BlockingConnection(pika.URLParameters(consumer.RABBITMQ_URL))
+    channel = connection.channel()
+    channel.queue_delete(queue=BENCH_QUEUE)
+    # Bound under a routing key no producer uses, so live traffic never reaches the scratch queue
+    consumer.declare_topology(channel, BENCH_QUEUE, routing_key='benchmark')
+    channel.queue_purge(queue=BENCH_QUEUE + '.dead')
+    channel.confirm_delivery()
+    properties = pika.BasicProperties(delivery_mode=2, content_type='application/json')
+    for body in events:
+        channel.basic_publish(exchange='', routing_key=BENCH_QUEUE, body=body, properties=properties)
+    connection.close()
+
+def reset_table():
+    conn = psycopg2.connect(host=consumer.DB_HOST, port=consumer.DB_PORT, user=consumer.DB_USER,
+                            password=consumer.DB_PASS, dbname=consumer.DB_NAME)
+    consumer.ensure_table(conn, BENCH_TABLE)
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {BENCH_TABLE}")
+    conn.commit()
+    return conn
+
+def run(batch_size, events):
+    db = reset_table()
+    fill_queue(events)
+    worker = consumer.IngestWorker(queue=BENCH_QUEUE, table=BENCH_TABLE, batch_size=batch_size,
+                                   prefetch=max(2 * batch_size, 10), routing_key='benchmark')
+    worker.connect()
+    try:
+        start = time.perf_counter()
+        worker.run(max_events=len(events))
+        elapsed = time.perf_counter() - start
+    finally:
+        worker.close()
+    with db.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM {BENCH_TABLE}")
+        stored = cur.fetchone()[0]
+    db.close()
+    return {
+        'batch_size': batch_size,
+        'events': len(events),
+        'stored': stored,
+        'seconds': round(elapsed, 2),
+        'events_per_sec': round(len(events) / elapsed),
+        'batches': worker.stats['batches'],
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure ingestion throughput per batch size")
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 500, 1000])
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events)
+    results = []
+    for batch_size in args.batch_sizes:
+        result = run(batch_size, events)
+        results.append(result)
+        status = 'ok' if result['stored'] == result['events'] else f"MISMATCH ({result['stored']} stored)"
+        print(f"batch {batch_size:>5}: {result['events_per_sec']:>7} events/s "
+              f"({result['seconds']}s, {result['batches']} commits) {status}")
+    print(json.dumps(results, indent=2))
@@ -1,24 +1,112 @@
-import pika
-import sys
-import datetime
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+
+import consumer
+from edupath.events import EventPublisher
+
+# Load generator: replays synthetic student_logs events at a target rate through the shared
+# publisher (edupath.events), to measure end-to-end ingest capacity together with consumer.py.
+#   pip install -e "../common[events]"
+#   python consumer.py &          (declares the queue; events published before it exists are returned)
+#   python producer.py --rate 5000 --duration 30 --verify
+# With --verify it also polls student_logs until every event has been stored.
+
+ACTIVITIES = ['view_course', 'take_quiz', 'submit_assignment', 'forum_post']
+
+def synthetic_event(rng, students):
+    activity = rng.choice(ACTIVITIES)
+    return {
+        'student_id': rng.randint(1, students),
+        'activity_type': activity,
+        'score': rng.randint(0, 100) if activity in ('take_quiz', 'submit_assignment') else None,
+        'duration_seconds': rng.randint(30, 3600),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
+
+def count_rows():
+    conn = psycopg2.connect(host=consumer.DB_HOST, port=consumer.DB_PORT, user=consumer.DB_USER,
+                            password=consumer.DB_PASS, dbname=consumer.DB_NAME)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM {consumer.TABLE}")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+def wait_for_rows(target, stall_seconds=15):
+    # Poll until target rows exist; give up once the count stops moving for stall_seconds
+    rows, last_change = count_rows(), time.perf_counter()
+    while rows < target:
+        time.sleep(0.25)
+        current = count_rows()
+        if current != rows:
+            rows, last_change = current, time.perf_counter()
+        elif time.perf_counter() - last_change > stall_seconds:
+            break
+    return rows, last_change
 
 def main():
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host='localhost'))
-    channel = connection.channel()
-
-    # Declare Exchange
-    channel.exchange_declare(exchange='edupath_logs', exchange_type='direct')
-
-    severity = 'info'
-    message = f'Hello from EduPath-MS at {datetime.datetime.now()}'
-    
-    channel.basic_publish(
-        exchange='edupath_logs',
-        routing_key=severity,
-        body=message
-    )
-    print(f" [x] Sent {severity}:{message}")
-    connection.close()
+    parser = argparse.ArgumentParser(description="Replay synthetic student_logs events at a target rate")
+    parser.add_argument('--url', default=consumer.RABBITMQ_URL)
+    parser.add_argument('--rate', type=float, default=1000, help="events per second")
+    parser.add_argument('--duration', type=float, default=10, help="seconds")
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=100, help="events per AMQP message")
+    parser.add_argument('--batch-ms', type=float, default=50)
+    parser.add_argument('--max-in-flight', type=int, default=32, help="unconfirmed messages")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verify', action='store_true', help="wait for the rows in student_logs")
+    args = parser.parse_args()
+
+    publisher = EventPublisher(url=args.url, batch_size=args.batch_size, batch_ms=args.batch_ms,
+                               max_in_flight=args.max_in_flight).start()
+    rows_before = count_rows() if args.verify else 0
+    rng = random.Random(args.seed)
+    total = int(args.rate * args.duration)
+    sent = 0       # events offered to the publisher, on the target schedule
+    accepted = 0   # events the publisher buffered; the rest were dropped
+
+    start = time.perf_counter()
+    next_report = start + 1
+    while sent < total:
+        now = time.perf_counter()
+        due = min(total, int((now - start) * args.rate))
+        while sent < due:
+            # A full buffer blocks the generator for up to 5s (a rate shortfall); past that the
+            # event is dropped and not counted as published
+            if publisher.publish(synthetic_event(rng, args.students), timeout=5.0):
+                accepted += 1
+            sent += 1
+        if now >= next_report:
+            print(f" [x] t={now - start:5.1f}s sent {accepted}/{total} dropped {sent - accepted} {publisher.stats()}")
+            next_report += 1
+        time.sleep(0.005)
+    publish_seconds = time.perf_counter() - start
+
+    confirmed = publisher.flush(timeout=60)
+    confirm_seconds = time.perf_counter() - start
+    stats = publisher.close()
+
+    report = {
+        'target_rate': args.rate,
+        'events': accepted,
+        'dropped': total - accepted,
+        'publish_rate': round(accepted / publish_seconds),
+        'confirmed_rate': round(stats['confirmed'] / confirm_seconds),
+        'all_confirmed': confirmed,
+        'publisher': stats,
+    }
+    if args.verify:
+        rows, last_change = wait_for_rows(rows_before + accepted)
+        ingested = rows - rows_before
+        report['ingested'] = ingested
+        report['ingest_rate'] = round(ingested / max(last_change - start, 1e-9))
+    print(json.dumps(report, indent=2))
 
 if __name__ == '__main__':
     main()
@@ -1,26 +1,135 @@
 from flask import Flask, request, jsonify
+import threading
+import time
+import os
 import recommender
+import personalize
+from edupath import discovery
 
 app = Flask(__name__)
 
+SYNC_INTERVAL = float(os.getenv('INDEX_SYNC_INTERVAL', '5'))
+
+def sync_loop():
+    # Pick up catalogue edits without a full rebuild
+    while True:
+        time.sleep(SYNC_INTERVAL)
+        try:
+            recommender.sync_index()
+            personalize.load_precomputed()
+        except Exception as e:
+            print(f"Index sync failed: {e}")
+
+MAX_BATCH = int(os.getenv('RECOMMEND_MAX_BATCH', '1000'))
+# A batch is searched with its largest k, so one huge k would size the whole batch's result arrays
+MAX_K = int(os.getenv('RECOMMEND_MAX_K', '100'))
+
+def parse_int(value):
+    # JSON integers or strings of digits; bools, floats and anything else are rejected
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ValueError(value)
+
+def parse_k(value):
+    k = parse_int(value)
+    if not 1 <= k <= MAX_K:
+        raise ValueError(value)
+    return k
+
+def is_student_request(data):
+    # Input: {"query": "I am struggling with SQL"} or {"student_id": 1}
+    return not data.get('query') and 'student_id' in data
+
 @app.route('/recommend', methods=['POST'])
 def get_recommendations():
     try:
         data = request.json
-        # Input: {"query": "I am struggling with SQL"} or {"student_id": 1}
-        # Ideally we fetch student profile. For now, simple query based.
-        
+        try:
+            k = parse_k(data.get('k', 3))
+        except ValueError:
+            return jsonify({"error": f"k must be an integer between 1 and {MAX_K}"}), 400
+        if is_student_request(data):
+            return jsonify(personalize.recommend_for_student(int(data['student_id']), k=k))
         query = data.get('query', '')
-        if not query and 'student_id' in data:
-            # TODO: Fetch student weak spot from DB. Mocking:
-            query = "Machine Learning Basics" 
-            
-        results = recommender.recommend(query)
+        # Optional: {"filters": {"topic": "CS", "content_type": ["video"], "difficulty_min": 1, "difficulty_max": 3}}
+        filters = data.get('filters')
+        if filters is not None and not isinstance(filters, dict):
+            return jsonify({"error": "filters must be an object"}), 400
+        results = recommender.recommend(query, k=k, filters=filters)
         return jsonify(results)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/recommend/batch', methods=['POST'])
+def get_recommendations_batch():
+    # Input: {"items": [{"query": "..."}, {"student_id": 1, "k": 5}], "k": 3}
+    try:
+        data = request.json or {}
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "items must be a non-empty list"}), 400
+        if len(items) > MAX_BATCH:
+            return jsonify({"error": f"At most {MAX_BATCH} items per batch"}), 400
+
+        # Validate every item before any work, so a bad one is a 400 and not a 500 halfway through
+        if not all(isinstance(item, dict) for item in items):
+            return jsonify({"error": "items must be objects"}), 400
+        try:
+            default_k = parse_k(data.get('k', 3))
+            ks = [parse_k(item.get('k', default_k)) for item in items]
+        except ValueError:
+            return jsonify({"error": f"k must be an integer between 1 and {MAX_K}"}), 400
+        try:
+            student_ids = {i: parse_int(item['student_id']) for i, item in enumerate(items) if is_student_request(item)}
+        except ValueError:
+            return jsonify({"error": "student_id must be an integer"}), 400
+
+        # Students resolve from the precomputed map; free-text queries share one encode + search
+        results = [None] * len(items)
+        text_pos = []
+        for i, item in enumerate(items):
+            if i in student_ids:
+                results[i] = personalize.recommend_for_student(student_ids[i], k=ks[i])
+            else:
+                text_pos.append(i)
+        if text_pos:
+            batch = recommender.recommend_batch([items[i].get('query', '') for i in text_pos], [ks[i] for i in text_pos])
+            for i, r in zip(text_pos, batch):
+                results[i] = r
+        return jsonify({"results": [
+            {"input": item, "recommendations": r} for item, r in zip(items, results)
+        ]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    # Readiness probe: encoder loaded and index in memory
+    status = {"model_loaded": recommender.model is not None, "index_loaded": recommender.index is not None}
+    return jsonify(status), 200 if recommender.is_ready() else 503
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    return jsonify(recommender.cache_stats())
+
+@app.route('/index/sync', methods=['POST'])
+def sync_index():
+    try:
+        return jsonify(recommender.sync_index())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == '__main__':
-    # Build index on start
+    # Encoder loads in the background; the index is opened (mmap) or built on start.
+    # Consul only routes to this replica once /ready passes.
+    discovery.register_in_background("reco-builder", 5003, check_path="/ready")
+    recommender.warm_model_async()
     recommender.load_index()
+    personalize.load_precomputed(force=True)
+    if SYNC_INTERVAL > 0:
+        threading.Thread(target=sync_loop, daemon=True).start()
     app.run(host='0.0.0.0', port=5003)
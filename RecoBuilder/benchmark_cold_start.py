@@ -0,0 +1,71 @@
+import argparse
+import json
+import subprocess
+import sys
+import os
+
+# Measures time-to-first-recommendation in a fresh interpreter, phase by phase.
+# Run after `python recommender.py` has written the index files.
+# Usage:
+#   python benchmark_cold_start.py --runs 5
+#   python benchmark_cold_start.py --no-mmap
+
+PROBE = r'''
+import json, os, sys, time
+def current_rss_mb():
+    # Current resident set (Linux); ru_maxrss below is the peak, which the model dominates
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return None
+t0 = time.perf_counter()
+import recommender
+t_import = time.perf_counter()
+rss_before = current_rss_mb()
+recommender.load_index(mmap=os.environ.get("INDEX_MMAP", "1") == "1")
+t_index = time.perf_counter()
+rss_after = current_rss_mb()
+recommender.get_model()
+t_model = time.perf_counter()
+recommender.recommend("Machine Learning Basics")
+t_first = time.perf_counter()
+try:
+    import resource
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+except ImportError:
+    rss_mb = None
+print(json.dumps({
+    "import_s": t_import - t0,
+    "index_load_s": t_index - t_import,
+    "model_load_s": t_model - t_index,
+    "first_query_s": t_first - t_model,
+    "time_to_first_reco_s": t_first - t0,
+    "index_rss_mb": rss_after - rss_before if rss_before is not None else None,
+    "max_rss_mb": rss_mb,
+}))
+'''
+
+def run_once(mmap):
+    env = dict(os.environ, INDEX_MMAP='1' if mmap else '0')
+    out = subprocess.run([sys.executable, '-c', PROBE], env=env, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="RecoBuilder cold-start benchmark")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--no-mmap', action='store_true', help="Load the index fully into RAM")
+    args = parser.parse_args()
+
+    runs = [run_once(not args.no_mmap) for _ in range(args.runs)]
+    keys = ["import_s", "index_load_s", "model_load_s", "first_query_s", "time_to_first_reco_s", "index_rss_mb",
+            "max_rss_mb"]
+    print(f"mmap={not args.no_mmap} runs={args.runs}")
+    for key in keys:
+        values = sorted(r[key] for r in runs if r[key] is not None)
+        if values:
+            print(f"  {key:<22} median={values[len(values) // 2]:.3f} min={values[0]:.3f} max={values[-1]:.3f}")
+
+if __name__ == "__main__":
+    main()
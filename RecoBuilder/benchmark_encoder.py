@@ -0,0 +1,50 @@
+import argparse
+import time
+import numpy as np
+
+import encoder
+
+# Encode throughput per backend and thread count, plus agreement with the torch reference.
+# Needs an export first: python export_onnx.py
+# Usage:
+#   python benchmark_encoder.py --n 5000 --threads 1 2 4
+
+WORDS = ("intro advanced python sql neural networks gradient descent transformer "
+         "probability pandas react hooks postgres indexing activation functions data").split()
+
+def synthetic_texts(n, seed=0):
+    # Mixed lengths, like real titles plus the occasional long description
+    rng = np.random.default_rng(seed)
+    lengths = rng.choice([3, 5, 8, 12, 40], size=n, p=[0.3, 0.3, 0.2, 0.15, 0.05])
+    return [' '.join(rng.choice(WORDS, size=l)) for l in lengths]
+
+def main():
+    parser = argparse.ArgumentParser(description="RecoBuilder encoder benchmark")
+    parser.add_argument('--n', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=encoder.ENCODER_BATCH_SIZE)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.n)
+    reference = None
+    print(f"n={args.n} batch_size={args.batch_size}")
+    print(f"{'backend':<24} {'threads':>7} {'texts/s':>9} {'min cos':>9} {'max diff':>9}")
+    for threads in args.threads:
+        backends = [
+            ("torch", lambda: encoder.TorchEncoder(threads=threads)),
+            ("onnx fp32", lambda: encoder.OnnxEncoder(model_file='model.onnx', threads=threads)),
+            ("onnx int8", lambda: encoder.OnnxEncoder(model_file='model_int8.onnx', threads=threads)),
+        ]
+        for name, factory in backends:
+            enc = factory()
+            enc.encode(texts[:args.batch_size])  # warm-up
+            start = time.perf_counter()
+            vecs = enc.encode(texts, batch_size=args.batch_size)
+            rate = len(texts) / (time.perf_counter() - start)
+            if reference is None:
+                reference = vecs
+            stats = encoder.compare(reference, vecs)
+            print(f"{name:<24} {threads:>7} {rate:>9.0f} {stats['min_cosine']:>9.5f} {stats['max_abs_diff']:>9.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import faiss
+
+import recommender
+from benchmark_index import synthetic_vectors
+
+# Filtered vs unfiltered search latency on a synthetic catalogue.
+# Topics are drawn with skewed frequencies so filters range from broad to very selective.
+# Usage:
+#   python benchmark_filters.py --n 500000 --index-type ivf_flat
+
+def main():
+    parser = argparse.ArgumentParser(description="RecoBuilder filtered search benchmark")
+    parser.add_argument('--n', type=int, default=200000)
+    parser.add_argument('--d', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--index-type', default='flat')
+    args = parser.parse_args()
+
+    # Topic t_i covers ~50%, 25%, 12.5%, ... of the catalogue
+    rng = np.random.default_rng(7)
+    n_topics = 12
+    weights = 0.5 ** np.arange(1, n_topics + 1)
+    weights /= weights.sum()
+    xb = synthetic_vectors(args.n, args.d)
+    ids = np.arange(1, args.n + 1, dtype='int64')
+    df = pd.DataFrame({
+        "resource_id": ids,
+        "title": [f"resource {i}" for i in ids],
+        "topic": rng.choice([f"t{i}" for i in range(n_topics)], size=args.n, p=weights),
+        "content_type": rng.choice(["video", "article", "pdf"], size=args.n),
+        "difficulty_level": rng.uniform(1, 5, size=args.n).round(1),
+    })
+
+    idx = recommender.make_id_index(args.d, args.n, args.index_type)
+    recommender.train_and_add(idx, xb, ids)
+    recommender.index = idx
+    recommender.resources_df = df.set_index('resource_id', drop=False)
+    recommender.bump_index_version()
+
+    xq = xb[rng.choice(args.n, size=args.queries, replace=False)].copy()
+    xq += 0.05 * rng.normal(size=xq.shape).astype('float32')
+
+    cases = [("none", None)]
+    for t in (0, 3, 6, 9):
+        cases.append((f"topic=t{t}", {"topic": (f"t{t}",)}))
+    cases.append(("topic=t3+video+diff<=2", {"topic": ("t3",), "content_type": ("video",), "difficulty_max": 2.0}))
+
+    print(f"n={args.n} index={args.index_type} k={args.k} queries={args.queries}")
+    print(f"{'filter':<26} {'selectivity':>11} {'ms/query':>9} {'full k':>7} {'recall':>7}")
+    for name, filters in cases:
+        allowed = recommender.filter_ids(filters) if filters else ids
+        start = time.perf_counter()
+        _, I = recommender.search(xq, args.k, filters)
+        ms = 1000 * (time.perf_counter() - start) / len(xq)
+
+        # Exact filtered ground truth by brute force over the allowed rows
+        sub = xb[allowed - 1]
+        exact = faiss.IndexFlatL2(args.d)
+        exact.add(sub)
+        _, gt = exact.search(xq, min(args.k, len(allowed)))
+        gt = allowed[gt]
+        recall = np.mean([len(set(g) & set(r)) / len(g) for g, r in zip(gt, I)])
+        full = np.mean((I != -1).sum(axis=1) == min(args.k, len(allowed)))
+        print(f"{name:<26} {len(allowed) / args.n:>10.2%} {ms:>9.3f} {full:>7.2%} {recall:>7.3f}")
+
+if __name__ == "__main__":
+    main()
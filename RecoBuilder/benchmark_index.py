@@ -0,0 +1,88 @@
+import argparse
+import time
+import numpy as np
+import faiss
+
+import recommender
+
+# Compares the approximate index types against the exact flat index.
+# Usage:
+#   python benchmark_index.py --n 1000000 --queries 1000 --k 10
+#   python benchmark_index.py --from-db            (real catalogue embeddings)
+
+def synthetic_vectors(n, d, seed=42):
+    # Clustered vectors behave much more like sentence embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 1000), d)).astype('float32')
+    x = centers[rng.integers(0, len(centers), size=n)] + 0.3 * rng.normal(size=(n, d)).astype('float32')
+    faiss.normalize_L2(x)
+    return x
+
+def recall_at_k(ground_truth, found):
+    hits = 0
+    for gt, res in zip(ground_truth, found):
+        hits += len(set(gt.tolist()) & set(res.tolist()))
+    return hits / ground_truth.size
+
+def run_one(name, params, xb, xq, k, ground_truth):
+    start = time.perf_counter()
+    idx = recommender.make_index(xb.shape[1], len(xb), name, params)
+    recommender.train_and_add(idx, xb)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, I = idx.search(xq, k)
+    search_seconds = time.perf_counter() - start
+
+    return {
+        "index": name,
+        "params": params,
+        "recall": recall_at_k(ground_truth, I),
+        "qps": len(xq) / search_seconds,
+        "memory_mb": recommender.index_memory_bytes(idx) / 1e6,
+        "build_s": build_seconds,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="RecoBuilder ANN index benchmark")
+    parser.add_argument('--n', type=int, default=200000, help="Number of catalogue vectors")
+    parser.add_argument('--d', type=int, default=384, help="Embedding dimension (MiniLM = 384)")
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--from-db', action='store_true', help="Use real resource embeddings instead of synthetic ones")
+    args = parser.parse_args()
+
+    if args.from_db:
+        recommender.build_index()
+        xb = np.vstack([recommender.index.reconstruct(int(rid)) for rid in recommender.resources_df.index])
+    else:
+        xb = synthetic_vectors(args.n, args.d)
+    rng = np.random.default_rng(0)
+    xq = xb[rng.choice(len(xb), size=min(args.queries, len(xb)), replace=False)].copy()
+    xq += 0.05 * rng.normal(size=xq.shape).astype('float32')
+
+    # Ground truth from the exact index
+    flat = faiss.IndexFlatL2(xb.shape[1])
+    flat.add(xb)
+    start = time.perf_counter()
+    _, ground_truth = flat.search(xq, args.k)
+    flat_qps = len(xq) / (time.perf_counter() - start)
+
+    configs = [
+        ("ivf_flat", {"nlist": 1024, "nprobe": 8}),
+        ("ivf_flat", {"nlist": 1024, "nprobe": 32}),
+        ("ivf_pq", {"nlist": 1024, "nprobe": 16, "pq_m": 48}),
+        ("ivf_pq", {"nlist": 1024, "nprobe": 64, "pq_m": 96}),
+        ("hnsw", {"hnsw_m": 32, "ef_search": 32}),
+        ("hnsw", {"hnsw_m": 32, "ef_search": 128}),
+    ]
+
+    print(f"n={len(xb)} d={xb.shape[1]} queries={len(xq)} k={args.k}")
+    print(f"{'index':<10} {'params':<45} {'recall@k':>9} {'QPS':>10} {'mem MB':>9} {'build s':>8}")
+    print(f"{'flat':<10} {'{}':<45} {1.0:>9.3f} {flat_qps:>10.0f} {recommender.index_memory_bytes(flat) / 1e6:>9.1f} {'-':>8}")
+    for name, params in configs:
+        r = run_one(name, params, xb, xq, args.k, ground_truth)
+        print(f"{r['index']:<10} {str(r['params']):<45} {r['recall']:>9.3f} {r['qps']:>10.0f} {r['memory_mb']:>9.1f} {r['build_s']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import time
+import numpy as np
+import faiss
+
+import recommender
+from benchmark_index import synthetic_vectors, recall_at_k
+
+# Memory vs recall for the compressed index stores, with and without exact re-ranking.
+# Memory is normalised to MB per million vectors; "codes" counts only the compressed
+# part, which is what must stay resident when the exact vectors are memory-mapped.
+# Usage:
+#   python benchmark_quantization.py --n 200000 --k 10
+
+def run_one(name, params, xb, xq, k, ground_truth):
+    idx = recommender.make_index(xb.shape[1], len(xb), name, params)
+    recommender.train_and_add(idx, xb)
+    total = recommender.index_memory_bytes(idx)
+    codes = total
+    if isinstance(idx, faiss.IndexRefine):
+        codes = recommender.index_memory_bytes(faiss.downcast_index(idx.base_index))
+
+    start = time.perf_counter()
+    _, I = idx.search(xq, k)
+    elapsed = time.perf_counter() - start
+    per_million = 1e6 / len(xb) / 1e6
+    return {
+        "recall": recall_at_k(ground_truth, I),
+        "qps": len(xq) / elapsed,
+        "codes_mb_per_m": codes * per_million,
+        "total_mb_per_m": total * per_million,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="RecoBuilder quantization benchmark")
+    parser.add_argument('--n', type=int, default=200000)
+    parser.add_argument('--d', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    xb = synthetic_vectors(args.n, args.d)
+    rng = np.random.default_rng(0)
+    xq = xb[rng.choice(len(xb), size=args.queries, replace=False)].copy()
+    xq += 0.05 * rng.normal(size=xq.shape).astype('float32')
+
+    flat = faiss.IndexFlatL2(args.d)
+    flat.add(xb)
+    _, ground_truth = flat.search(xq, args.k)
+
+    m = args.d // 8
+    configs = [
+        ("flat", {}),
+        ("sq_fp16", {}),
+        ("sq8", {}),
+        ("sq8", {"rerank_factor": 4}),
+        ("pq", {"pq_m": m}),
+        ("pq", {"pq_m": m, "rerank_factor": 4}),
+        ("pq", {"pq_m": m, "rerank_factor": 16}),
+        ("ivf_pq", {"pq_m": m, "nprobe": 32, "rerank_factor": 8}),
+    ]
+    print(f"n={args.n} d={args.d} k={args.k} (float32 baseline = {args.d * 4} bytes/vector)")
+    print(f"{'index':<9} {'params':<40} {'recall':>7} {'loss':>7} {'QPS':>9} {'codes MB/M':>11} {'total MB/M':>11}")
+    for name, params in configs:
+        r = run_one(name, params, xb, xq, args.k, ground_truth)
+        print(f"{name:<9} {str(params):<40} {r['recall']:>7.3f} {1 - r['recall']:>7.3f} {r['qps']:>9.0f} "
+              f"{r['codes_mb_per_m']:>11.1f} {r['total_mb_per_m']:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import os
+import numpy as np
+
+class EmbeddingStore:
+    # Persistent content-addressed embedding cache.
+    # Vectors live in an append-only float32 file read through np.memmap; a parallel
+    # .index.npz holds one 16-byte key per row (key = blake2b(model name + text), stored as an
+    # (n, 16) uint8 array) and the vector dimension. The index is replaced atomically after the vectors are appended, so it is
+    # the commit point: rows past len(keys) * dim are from an append that never committed.
+    def __init__(self, directory, model_name):
+        self.model_name = model_name
+        slug = model_name.replace('/', '_')
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, f"{slug}.f32")
+        self.index_path = os.path.join(directory, f"{slug}.index.npz")
+        self.reused = 0
+        self.computed = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        self.dim = None
+        self.rows = {}
+        self.matrix = None
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if not os.path.exists(self.index_path):
+            self._truncate(size, 0)
+            return
+        with np.load(self.index_path) as index:
+            keys = index['keys']
+            dim = int(index['dim'])
+        expected = len(keys) * dim * 4
+        if size < expected:
+            # Vectors missing for committed keys: nothing in the file can be trusted
+            print(f"Embedding store {self.vectors_path} is shorter than its index ({size} < {expected} bytes); starting over")
+            os.remove(self.index_path)
+            self._truncate(size, 0)
+            return
+        self._truncate(size, expected)
+        self.dim = dim
+        if len(keys) == 0:
+            return
+        if keys.dtype.kind == 'S':
+            # Older stores saved keys as S16, which strips trailing NUL bytes on read: pad them back
+            self.rows = {bytes(k).ljust(16, b'\0'): i for i, k in enumerate(keys)}
+        else:
+            self.rows = {k.tobytes(): i for i, k in enumerate(keys)}
+        self.matrix = np.memmap(self.vectors_path, dtype='float32', mode='r', shape=(len(keys), dim))
+
+    def _truncate(self, size, expected):
+        # Drop rows appended by a write that crashed before the index was replaced
+        if size > expected:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(expected)
+
+    def key(self, text):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.model_name.encode('utf-8'))
+        h.update(b'\0')
+        h.update(text.encode('utf-8'))
+        return h.digest()
+
+    def get_or_compute(self, texts, encode_fn):
+        # Returns an (n, d) float32 matrix; only texts never seen before reach encode_fn
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            missing = list(dict.fromkeys(k for k in keys if k not in self.rows))
+            if missing:
+                first = {}
+                for k, t in zip(keys, texts):
+                    first.setdefault(k, t)
+                encoded = np.ascontiguousarray(encode_fn([first[k] for k in missing]), dtype='float32')
+                self._append(missing, encoded)
+            self.computed += len(missing)
+            self.reused += len(keys) - len(missing)
+            out = np.asarray(self.matrix[[self.rows[k] for k in keys]], dtype='float32')
+        return out, {"reused": len(keys) - len(missing), "computed": len(missing)}
+
+    def _append(self, keys, vectors):
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dim})")
+        with open(self.vectors_path, 'ab') as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        ordered = [k for k, _ in sorted(self.rows.items(), key=lambda kv: kv[1])] + keys
+        all_keys = np.frombuffer(b''.join(ordered), dtype='uint8').reshape(len(ordered), 16)
+        np.savez(self.index_path + '.tmp.npz', keys=all_keys, dim=np.int64(vectors.shape[1]))
+        os.replace(self.index_path + '.tmp.npz', self.index_path)
+        self.matrix = None
+        self._load()
+
+    def stats(self):
+        return {"size": len(self.rows), "reused": self.reused, "computed": self.computed}
@@ -0,0 +1,111 @@
+import os
+import numpy as np
+
+# Selectable sentence encoder backends for RecoBuilder.
+#   ENCODER_BACKEND=torch  SentenceTransformer in PyTorch eager mode (reference)
+#   ENCODER_BACKEND=onnx   exported MiniLM on onnxruntime (see export_onnx.py);
+#                          ENCODER_ONNX_FILE=model_int8.onnx selects the quantized export
+# ENCODER_THREADS caps intra-op threads so encoding does not fight Flask worker threads.
+#
+# Tolerance vs the torch reference (checked by export_onnx.py / benchmark_encoder.py):
+#   onnx fp32: cosine >= 0.9999, max abs diff <= 1e-4 per component
+#   onnx int8: cosine >= 0.99
+
+MODEL_NAME = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+ENCODER_BACKEND = os.getenv('ENCODER_BACKEND', 'torch')
+ENCODER_THREADS = int(os.getenv('ENCODER_THREADS', '0'))  # 0 = library default
+ENCODER_BATCH_SIZE = int(os.getenv('ENCODER_BATCH_SIZE', '64'))
+ONNX_DIR = os.getenv('ENCODER_ONNX_DIR', 'onnx_model')
+ONNX_FILE = os.getenv('ENCODER_ONNX_FILE', 'model.onnx')
+
+TOLERANCE = {
+    "model.onnx": {"min_cosine": 0.9999, "max_abs_diff": 1e-4},
+    "model_int8.onnx": {"min_cosine": 0.99, "max_abs_diff": None},
+}
+
+class TorchEncoder:
+    def __init__(self, model_name=MODEL_NAME, threads=ENCODER_THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        self.name = encoder_id('torch')
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=ENCODER_BATCH_SIZE):
+        # SentenceTransformer already sorts each call by length to reduce padding
+        return np.asarray(self.model.encode(list(texts), batch_size=batch_size), dtype='float32')
+
+class OnnxEncoder:
+    def __init__(self, model_dir=ONNX_DIR, model_file=ONNX_FILE, threads=ENCODER_THREADS, model_name=MODEL_NAME):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), opts,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=256)
+        self.tokenizer.enable_padding()  # pad to the longest text in each batch
+        self.name = encoder_id('onnx', model_file)
+
+    def _encode_batch(self, texts):
+        enc = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in enc], dtype='int64')
+        mask = np.array([e.attention_mask for e in enc], dtype='int64')
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        # Same head as the SentenceTransformer pipeline: mean pooling, then L2 normalize
+        m = mask[:, :, None].astype('float32')
+        pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts, batch_size=ENCODER_BATCH_SIZE):
+        # Sort by length so each batch pads to a similar size, then restore input order
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype='float32')
+        order = np.argsort([-len(t) for t in texts], kind='stable')
+        out = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            chunk = order[start:start + batch_size]
+            vecs = self._encode_batch([texts[i] for i in chunk])
+            for i, v in zip(chunk, vecs):
+                out[i] = v
+        return np.vstack(out).astype('float32')
+
+def encoder_id(backend=ENCODER_BACKEND, model_file=ONNX_FILE):
+    # Identifies the embedding space; keys the embedding store and the saved index
+    if backend == 'onnx':
+        return f"{MODEL_NAME}:onnx:{model_file}"
+    return f"{MODEL_NAME}:{backend}"
+
+def load_encoder(backend=ENCODER_BACKEND):
+    print(f"Loading encoder {MODEL_NAME} (backend={backend}, threads={ENCODER_THREADS or 'default'})...")
+    if backend == 'torch':
+        return TorchEncoder()
+    if backend == 'onnx':
+        return OnnxEncoder()
+    raise ValueError(f"Unknown ENCODER_BACKEND: {backend}")
+
+def compare(reference, candidate):
+    # Per-row cosine and component-wise max abs diff between two embedding matrices
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return {
+        "min_cosine": float((ref * cand).sum(axis=1).min()),
+        "max_abs_diff": float(np.abs(reference - candidate).max()),
+    }
+
+def within_tolerance(stats, model_file=ONNX_FILE):
+    tol = TOLERANCE.get(model_file, TOLERANCE["model_int8.onnx"])
+    if stats["min_cosine"] < tol["min_cosine"]:
+        return False
+    return tol["max_abs_diff"] is None or stats["max_abs_diff"] <= tol["max_abs_diff"]
@@ -0,0 +1,72 @@
+import argparse
+import os
+
+import encoder
+
+# Exports the MiniLM transformer to ONNX (plus an int8 dynamic-quantized copy) and
+# checks both against the SentenceTransformer reference.
+# Usage:
+#   python export_onnx.py --out onnx_model
+
+SAMPLE_TEXTS = [
+    "Intro to Python Data Structures",
+    "Understanding Gradient Descent",
+    "Advanced SQL Queries",
+    "Transformer Architecture Explained",
+    "I am struggling with activation functions in neural networks",
+    "PostgreSQL Indexing Strategies",
+    "a",
+]
+
+def export(model_name, out_dir, opset=17):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    hf_name = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(hf_name)
+    model = AutoModel.from_pretrained(hf_name).eval()
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer.save_pretrained(out_dir)  # writes tokenizer.json for the tokenizers runtime
+
+    sample = tokenizer(SAMPLE_TEXTS[:2], padding=True, return_tensors='pt')
+    input_names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in sample]
+    path = os.path.join(out_dir, 'model.onnx')
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in input_names),
+            path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes={name: {0: 'batch', 1: 'seq'} for name in input_names + ['last_hidden_state']},
+            opset_version=opset,
+        )
+    print(f"Exported {path}")
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    int8_path = os.path.join(out_dir, 'model_int8.onnx')
+    quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Quantized {int8_path}")
+
+def verify(out_dir):
+    reference = encoder.TorchEncoder().encode(SAMPLE_TEXTS)
+    ok = True
+    for model_file in ('model.onnx', 'model_int8.onnx'):
+        candidate = encoder.OnnxEncoder(out_dir, model_file).encode(SAMPLE_TEXTS)
+        stats = encoder.compare(reference, candidate)
+        passed = encoder.within_tolerance(stats, model_file)
+        ok = ok and passed
+        print(f"{model_file}: min cosine={stats['min_cosine']:.6f} max abs diff={stats['max_abs_diff']:.2e} "
+              f"{'OK' if passed else 'OUT OF TOLERANCE'}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export MiniLM to ONNX for ENCODER_BACKEND=onnx")
+    parser.add_argument('--model', default=encoder.MODEL_NAME)
+    parser.add_argument('--out', default=encoder.ONNX_DIR)
+    parser.add_argument('--verify-only', action='store_true')
+    args = parser.parse_args()
+    if not args.verify_only:
+        export(args.model, args.out)
+    if not verify(args.out):
+        raise SystemExit(1)
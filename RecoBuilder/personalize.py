@@ -0,0 +1,175 @@
+import pandas as pd
+import numpy as np
+from sqlalchemy import text
+from datetime import datetime, timezone
+import threading
+import argparse
+import os
+
+import recommender
+from edupath import db
+
+# Student-aware recommendations.
+# A student's query vector is the weighted mean of the embeddings of the topics they
+# score lowest on (weight = how far below the threshold), and their profile type picks
+# a difficulty band; students without weak spots get DEFAULT_QUERY in their band. The nightly
+# job (python personalize.py) precomputes top-k for every student with batched encode + search,
+# so /recommend with a student_id is a dict lookup.
+
+WEAK_SCORE_THRESHOLD = float(os.getenv('WEAK_SCORE_THRESHOLD', '0.6'))  # score / max_score
+PRECOMPUTE_K = int(os.getenv('PRECOMPUTE_K', '10'))
+PROFILE_FILTERS = {
+    'At Risk': {'difficulty_max': 2.5},
+    'High Achiever': {'difficulty_min': 2.5},
+}
+DEFAULT_QUERY = "Machine Learning Basics"
+
+student_recos = {}          # student_id -> (resource_ids, distances), best first
+student_recos_loaded_at = None
+student_recos_lock = threading.Lock()
+
+def load_weak_spots(engine, student_ids=None):
+    # One row per (student, topic) below the threshold; quizzes.topic when known, else the quiz title
+    query = """
+        SELECT g.student_id,
+               COALESCE(q.topic, g.quiz_title) AS topic,
+               AVG(g.score::float / NULLIF(g.max_score, 0)) AS ratio
+        FROM grades g
+        LEFT JOIN quizzes q ON q.id = g.quiz_id
+        {where}
+        GROUP BY g.student_id, COALESCE(q.topic, g.quiz_title)
+        HAVING AVG(g.score::float / NULLIF(g.max_score, 0)) < :threshold
+    """
+    params = {"threshold": WEAK_SCORE_THRESHOLD}
+    where = ""
+    if student_ids is not None:
+        where = "WHERE g.student_id = ANY(:ids)"
+        params["ids"] = list(student_ids)
+    return pd.read_sql(text(query.format(where=where)), engine, params=params)
+
+def load_profile_types(engine, student_ids=None):
+    if student_ids is None:
+        df = pd.read_sql("SELECT student_id, profile_type FROM student_profiles", engine)
+    else:
+        df = pd.read_sql(text("SELECT student_id, profile_type FROM student_profiles WHERE student_id = ANY(:ids)"),
+                         engine, params={"ids": list(student_ids)})
+    return dict(zip(df['student_id'], df['profile_type']))
+
+def load_student_ids(engine):
+    return db.fetch_frame("SELECT id FROM students")['id'].astype('int64').tolist()
+
+def student_vectors(weak_df):
+    # Every distinct topic string is encoded once, in a single batch
+    if weak_df.empty:
+        return {}
+    topics = weak_df['topic'].fillna('').astype(str).unique().tolist()
+    topic_vecs = dict(zip(topics, recommender.encode_queries(topics)))
+
+    vectors = {}
+    for sid, group in weak_df.groupby('student_id'):
+        weights = (WEAK_SCORE_THRESHOLD - group['ratio'].fillna(0)).clip(lower=0.05).values
+        mat = np.vstack([topic_vecs[str(t)] for t in group['topic'].fillna('')])
+        vec = (weights[:, None] * mat).sum(axis=0) / weights.sum()
+        norm = np.linalg.norm(vec)
+        vectors[int(sid)] = (vec / norm if norm > 0 else vec).astype('float32')
+    return vectors
+
+def search_students(vectors, profiles, k):
+    # One multi-query search per profile group (filters apply to a whole search call)
+    results = {}
+    groups = {}
+    for sid in vectors:
+        groups.setdefault(profiles.get(sid), []).append(sid)
+    for profile, sids in groups.items():
+        vecs = np.vstack([vectors[s] for s in sids])
+        D, I = recommender.search(vecs, k, recommender.normalize_filters(PROFILE_FILTERS.get(profile)))
+        for row, sid in enumerate(sids):
+            results[sid] = (I[row], D[row])
+    return results
+
+def default_hits(profile_types, k):
+    # Students without weak spots share the DEFAULT_QUERY vector: one search per profile type
+    vec = recommender.encode_queries([DEFAULT_QUERY])[0]
+    return search_students({p: vec for p in profile_types}, {p: p for p in profile_types}, k)
+
+def precompute_all(k=PRECOMPUTE_K):
+    # Nightly batch: top-k for every student, written to student_recommendations
+    global student_recos, student_recos_loaded_at
+    print("Precomputing student recommendations...")
+    if recommender.index is None:
+        recommender.load_index()
+    engine = db.get_engine()
+
+    weak_df = load_weak_spots(engine)
+    profiles = load_profile_types(engine)
+    vectors = student_vectors(weak_df)
+    hits = search_students(vectors, profiles, k)
+    no_weak_spots = [sid for sid in load_student_ids(engine) if sid not in hits]
+    if no_weak_spots:
+        shared = default_hits({profiles.get(sid) for sid in no_weak_spots}, k)
+        for sid in no_weak_spots:
+            hits[sid] = shared[profiles.get(sid)]
+
+    computed_at = datetime.now(timezone.utc)
+    rows = []
+    for sid, (ids, dists) in hits.items():
+        for rank, (rid, dist) in enumerate(zip(ids, dists)):
+            if rid != -1:
+                rows.append({"student_id": sid, "rank": rank, "resource_id": int(rid),
+                             "distance": float(dist), "computed_at": computed_at})
+    out = pd.DataFrame(rows, columns=["student_id", "rank", "resource_id", "distance", "computed_at"])
+    out.to_sql('student_recommendations', engine, if_exists='replace', index=False)
+
+    with student_recos_lock:
+        student_recos = {sid: (ids[ids != -1], dists[ids != -1]) for sid, (ids, dists) in hits.items()}
+        student_recos_loaded_at = computed_at
+    print(f"Stored recommendations for {len(hits)} students ({len(no_weak_spots)} without weak spots).")
+    return len(hits)
+
+def load_precomputed(force=False):
+    # Load (or refresh, if the nightly job ran since) the precomputed map
+    global student_recos, student_recos_loaded_at
+    engine = db.get_engine()
+    try:
+        latest = pd.read_sql("SELECT max(computed_at) AS latest FROM student_recommendations", engine)['latest'][0]
+    except Exception:
+        return False  # job has not run yet
+    if latest is None or (not force and student_recos_loaded_at is not None and latest <= student_recos_loaded_at):
+        return False
+    df = pd.read_sql("SELECT student_id, resource_id, distance FROM student_recommendations ORDER BY student_id, rank", engine)
+    recos = {int(sid): (g['resource_id'].values.astype('int64'), g['distance'].values.astype('float32'))
+             for sid, g in df.groupby('student_id')}
+    with student_recos_lock:
+        student_recos = recos
+        student_recos_loaded_at = latest
+    print(f"Loaded precomputed recommendations for {len(recos)} students.")
+    return True
+
+def recommend_for_student(student_id, k=3):
+    if recommender.index is None:
+        recommender.load_index()
+
+    # 1. Precomputed (O(1))
+    stored = student_recos.get(int(student_id))
+    if stored is not None and k <= PRECOMPUTE_K:
+        ids, dists = stored
+        with recommender.index_lock:
+            return recommender.hits_to_results(ids, dists, k)
+
+    # 2. Live: student joined after the nightly run, or asked for more than was stored
+    engine = db.get_engine()
+    vectors = student_vectors(load_weak_spots(engine, [int(student_id)]))
+    if vectors:
+        profiles = load_profile_types(engine, [int(student_id)])
+        ids, dists = search_students(vectors, profiles, k)[int(student_id)]
+        with recommender.index_lock:
+            return recommender.hits_to_results(ids, dists, k)
+
+    # 3. No grades yet
+    return recommender.recommend(DEFAULT_QUERY, k)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nightly precomputation of per-student recommendations")
+    parser.add_argument('--k', type=int, default=PRECOMPUTE_K)
+    args = parser.parse_args()
+    precompute_all(args.k)
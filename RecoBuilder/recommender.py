@@ -1,22 +1,196 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import text
 import faiss
 import numpy as np
-import pickle
+import threading
+import json
 import os
 
-# DB Config
-DB_USER = 'admin'
-DB_PASS = 'adminpassword'
-DB_HOST = '127.0.0.1'
-DB_PORT = '5433'
-DB_NAME = 'edupath_db'
-DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+from cache import LRUCache
+from embedding_store import EmbeddingStore
+import encoder
+from edupath import db
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-index = None
-resources_df = None
+# Index Config
+# INDEX_TYPE: flat (exact), ivf_flat, ivf_pq, hnsw, and the compressed stores
+# sq8 (int8 scalar quantizer), sq_fp16 (half precision), pq (product quantizer)
+INDEX_TYPE = os.getenv('INDEX_TYPE', 'flat')
+INDEX_PARAMS = {
+    "nlist": int(os.getenv('INDEX_NLIST', '1024')),        # IVF: number of coarse cells
+    "nprobe": int(os.getenv('INDEX_NPROBE', '16')),        # IVF: cells visited per query
+    "pq_m": int(os.getenv('INDEX_PQ_M', '48')),            # IVF-PQ: sub-quantizers (must divide d)
+    "pq_nbits": int(os.getenv('INDEX_PQ_NBITS', '8')),     # IVF-PQ: bits per sub-code
+    "hnsw_m": int(os.getenv('INDEX_HNSW_M', '32')),        # HNSW: graph degree
+    "ef_construction": int(os.getenv('INDEX_EF_CONSTRUCTION', '80')),
+    "ef_search": int(os.getenv('INDEX_EF_SEARCH', '64')),
+    # Re-rank: compressed types fetch rerank_factor * k candidates and re-score them
+    # against exact float32 vectors (0 disables). With INDEX_MMAP both the codes and the
+    # exact vectors are memory-mapped (IO_FLAG_MMAP_IFC), so only re-scored rows are paged in.
+    # The refine wrapper has no remove_ids: edits and deletes trigger a full rebuild (see
+    # sync_index); the embeddings come from the store, so that rebuild re-encodes nothing.
+    "rerank_factor": int(os.getenv('INDEX_RERANK_FACTOR', '0')),
+}
+QUANTIZED_TYPES = ('sq8', 'sq_fp16', 'pq', 'ivf_pq')
+
+MODEL_NAME = encoder.MODEL_NAME
+ENCODER_ID = encoder.encoder_id()  # model + backend; embeddings differ slightly across backends
+
+model = None            # encoder (see encoder.py), loaded lazily by get_model(); see warm_model_async()
+model_lock = threading.Lock()
+index = None            # FAISS index keyed by resource_id (see make_id_index)
+resources_df = None     # resource metadata indexed by resource_id
+result_records = {}     # resource_id -> plain-python dict, ready for jsonify (see make_records)
+index_watermark = None  # max(updated_at) of the rows currently in the index
+index_version = 0       # bumped on every index change; keys the result cache
+index_lock = threading.RLock()
+sync_lock = threading.Lock()  # serializes sync_index() callers
+
+# Persistence: native FAISS index file (memory-mapped on load), columnar metadata,
+# and a small JSON state file for the sync watermark
+INDEX_PATH = os.getenv('INDEX_PATH', 'faiss_index.bin')
+META_PATH = os.getenv('INDEX_META_PATH', 'resources.parquet')
+STATE_PATH = os.getenv('INDEX_STATE_PATH', 'index_state.json')
+INDEX_MMAP = os.getenv('INDEX_MMAP', '1') == '1'
+index_mmapped = False   # mmap'd indexes are reloaded into RAM before the first update
+
+# Text sent to the encoder per resource, e.g. "title,topic,description"
+INDEX_TEXT_FIELDS = [c.strip() for c in os.getenv('INDEX_TEXT_FIELDS', 'title').split(',') if c.strip()]
+EMBEDDING_STORE_DIR = os.getenv('EMBEDDING_STORE_DIR', 'embedding_store')
+# Longer than any catalogue-writing transaction is expected to stay open
+SYNC_OVERLAP_SECONDS = int(os.getenv('INDEX_SYNC_OVERLAP_SECONDS', '300'))
+embedding_store = None  # EmbeddingStore, opened on first encode
+
+def get_model():
+    global model
+    if model is None:
+        with model_lock:
+            if model is None:
+                # Backends import torch / onnxruntime lazily, so index-only callers never pay for them
+                model = encoder.load_encoder()
+    return model
+
+def warm_model_async():
+    t = threading.Thread(target=get_model, daemon=True)
+    t.start()
+    return t
+
+def is_ready():
+    return model is not None and index is not None
+
+# Query caches: encoder CPU time dominates /recommend, and traffic repeats a small set of queries
+embedding_cache = LRUCache(maxsize=int(os.getenv('EMBEDDING_CACHE_SIZE', '10000')),
+                           ttl=float(os.getenv('EMBEDDING_CACHE_TTL', '3600')))
+result_cache = LRUCache(maxsize=int(os.getenv('RESULT_CACHE_SIZE', '10000')),
+                        ttl=float(os.getenv('RESULT_CACHE_TTL', '600')))
+
+def normalize_query(query_text):
+    return ' '.join(str(query_text).lower().split())
+
+def bump_index_version():
+    # Any index change invalidates cached top-k results (embeddings stay valid)
+    global index_version
+    with index_lock:
+        index_version += 1
+    result_cache.clear()
+
+def encode_query(query_text):
+    key = normalize_query(query_text)
+    vec = embedding_cache.get(key)
+    if vec is None:
+        vec = np.asarray(get_model().encode([key]), dtype='float32')[0]
+        embedding_cache.put(key, vec)
+    return vec
+
+def cache_stats():
+    return {
+        "index_version": index_version,
+        "embedding_cache": embedding_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "embedding_store": embedding_store.stats() if embedding_store is not None else None,
+    }
+
+def make_index(d, n, index_type=INDEX_TYPE, params=None):
+    # Build an empty FAISS index of the requested type for n vectors of dim d
+    p = dict(INDEX_PARAMS, **(params or {}))
+    if index_type in ('ivf_pq', 'pq') and n < 2 ** p['pq_nbits']:
+        # PQ codebooks cannot be trained on fewer points than centroids
+        print(f"Only {n} vectors, too few to train PQ. Falling back to {index_type[:-2] + 'flat'}.")
+        index_type = index_type[:-2] + 'flat'
+    idx = make_base_index(d, n, index_type, p)
+    if index_type in QUANTIZED_TYPES and p['rerank_factor'] > 1:
+        idx = faiss.IndexRefineFlat(idx)
+        idx.k_factor = p['rerank_factor']
+    return idx
+
+def make_base_index(d, n, index_type, p):
+    if index_type == 'flat':
+        return faiss.IndexFlatL2(d)
+    if index_type in ('ivf_flat', 'ivf_pq'):
+        # IVF needs ~39 training points per cell; shrink nlist for small catalogues
+        nlist = max(1, min(p['nlist'], n // 39))
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == 'ivf_flat':
+            idx = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_L2)
+        else:
+            idx = faiss.IndexIVFPQ(quantizer, d, nlist, p['pq_m'], p['pq_nbits'])
+        idx.nprobe = min(p['nprobe'], nlist)
+        return idx
+    if index_type == 'hnsw':
+        idx = faiss.IndexHNSWFlat(d, p['hnsw_m'])
+        idx.hnsw.efConstruction = p['ef_construction']
+        idx.hnsw.efSearch = p['ef_search']
+        return idx
+    if index_type == 'sq8':
+        return faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit)
+    if index_type == 'sq_fp16':
+        return faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16)
+    if index_type == 'pq':
+        return faiss.IndexPQ(d, p['pq_m'], p['pq_nbits'])
+    raise ValueError(f"Unknown INDEX_TYPE: {index_type}")
+
+def make_id_index(d, n, index_type=INDEX_TYPE, params=None):
+    # Index whose labels are resource_ids. IVF stores external ids natively (and
+    # its hashtable direct map only removes via IDSelectorArray, which IDMap2
+    # would not pass through); everything else goes behind an IndexIDMap2.
+    idx = make_index(d, n, index_type, params)
+    if isinstance(idx, faiss.IndexIVF):
+        return idx
+    return faiss.IndexIDMap2(idx)
+
+def train_and_add(idx, vectors, ids=None):
+    # IVF / PQ indexes must be trained before vectors can be added
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    if not idx.is_trained:
+        idx.train(vectors)
+    if ids is None:
+        idx.add(vectors)
+    else:
+        idx.add_with_ids(vectors, np.ascontiguousarray(ids, dtype='int64'))
+    inner = faiss.downcast_index(idx.index) if isinstance(idx, faiss.IndexIDMap2) else idx
+    if isinstance(inner, faiss.IndexIVF) and inner.direct_map.type == faiss.DirectMap.NoMap:
+        # Lets reconstruct() work (exact filtered search); the hashtable form still
+        # supports remove_ids. Set after the first add: it is built from the lists.
+        inner.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return idx
+
+def index_memory_bytes(idx):
+    # Serialized size is a close proxy for the resident size of the index
+    return int(faiss.serialize_index(idx).nbytes)
+
+RECORD_EXCLUDE = ('updated_at',)  # internal sync column, not part of responses
+
+def make_records(df):
+    # Convert each row to native Python types once, so responses never touch pandas
+    cols = [c for c in df.columns if c not in RECORD_EXCLUDE]
+    plain = df[cols].astype(object).where(df[cols].notna(), None)
+    return dict(zip(df['resource_id'].astype('int64').tolist(), plain.to_dict('records')))
+
+def compact_metadata(df):
+    # Low-cardinality string columns as categoricals; values still serialize as str
+    for col in ('topic', 'content_type'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
 
 def init_resources(engine):
     with engine.connect() as conn:
@@ -26,9 +200,25 @@ def init_resources(engine):
                 title VARCHAR(255),
                 content_type VARCHAR(50),
                 topic VARCHAR(100),
-                difficulty_level FLOAT
+                difficulty_level FLOAT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """))
+        # updated_at drives incremental index sync; keep it current on every edit
+        conn.execute(text("ALTER TABLE resources ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"))
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION resources_touch_updated_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.updated_at = CURRENT_TIMESTAMP;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+        """))
+        conn.execute(text("DROP TRIGGER IF EXISTS resources_touch_updated_at ON resources"))
+        conn.execute(text("""
+            CREATE TRIGGER resources_touch_updated_at BEFORE UPDATE ON resources
+            FOR EACH ROW EXECUTE FUNCTION resources_touch_updated_at();
+        """))
         conn.commit()
         
         result = conn.execute(text("SELECT count(*) FROM resources"))
@@ -50,51 +240,423 @@ def init_resources(engine):
                 conn.execute(text("INSERT INTO resources (title, content_type, topic, difficulty_level) VALUES (:title, :content_type, :topic, :difficulty)"), r)
             conn.commit()
 
+def resource_text(df):
+    # Join the configured fields; columns missing from the table are skipped
+    fields = [c for c in INDEX_TEXT_FIELDS if c in df.columns] or ['title']
+    return df[fields].fillna('').astype(str).agg(' - '.join, axis=1).tolist()
+
+def encode_resources(df):
+    # Only new or edited text reaches the encoder; everything else comes from the store
+    global embedding_store
+    if embedding_store is None:
+        embedding_store = EmbeddingStore(EMBEDDING_STORE_DIR, ENCODER_ID)
+    vectors, stats = embedding_store.get_or_compute(
+        resource_text(df), lambda texts: get_model().encode(texts))
+    print(f"Embeddings: {stats['reused']} reused, {stats['computed']} computed.")
+    return vectors
+
+def max_watermark(df):
+    if df.empty or 'updated_at' not in df.columns or df['updated_at'].isna().all():
+        return None
+    return df['updated_at'].max()
+
 def build_index():
-    global index, resources_df
+    global index, resources_df, result_records, index_watermark, index_mmapped
     print("Building Recommendation Index...")
-    engine = create_engine(DATABASE_URI)
-    init_resources(engine)
+    init_resources(db.get_engine())
     
-    resources_df = pd.read_sql("SELECT * FROM resources", engine)
+    df = db.fetch_frame("SELECT * FROM resources")
     
-    if resources_df.empty:
+    if df.empty:
         print("No resources to index.")
         return
 
     # Create Embeddings
-    print("Encoding titles...")
-    embeddings = model.encode(resources_df['title'].tolist())
+    print(f"Encoding resources ({', '.join(INDEX_TEXT_FIELDS)})...")
+    embeddings = encode_resources(df)
     
-    # FAISS Index
+    # FAISS Index keyed by resource_id so hits never depend on row positions
     d = embeddings.shape[1]
-    index = faiss.IndexFlatL2(d)
-    index.add(np.array(embeddings).astype('float32'))
-    
-    with open("faiss_index.pkl", "wb") as f:
-        pickle.dump((index, resources_df), f)
+    print(f"Building {INDEX_TYPE} index...")
+    new_index = make_id_index(d, len(embeddings))
+    train_and_add(new_index, embeddings, df['resource_id'].values)
+
+    with index_lock:
+        index = new_index
+        index_mmapped = False
+        resources_df = compact_metadata(df.set_index('resource_id', drop=False))
+        result_records = make_records(df)
+        index_watermark = max_watermark(df)
+        bump_index_version()
+        save_index()
     print("Index built and saved.")
 
-def recommend(query_text, k=3):
+def save_index():
+    # Write to temp files and rename so readers never see a half-written index
+    with index_lock:
+        faiss.write_index(index, INDEX_PATH + '.tmp')
+        resources_df.reset_index(drop=True).to_parquet(META_PATH + '.tmp', index=False)
+        with open(STATE_PATH + '.tmp', 'w') as f:
+            json.dump({
+                "watermark": index_watermark.isoformat() if index_watermark is not None else None,
+                "model": ENCODER_ID,
+                "index_type": INDEX_TYPE,
+            }, f)
+        os.replace(INDEX_PATH + '.tmp', INDEX_PATH)
+        os.replace(META_PATH + '.tmp', META_PATH)
+        os.replace(STATE_PATH + '.tmp', STATE_PATH)
+
+def ensure_writable():
+    # Memory-mapped indexes are read-only; load a private copy before mutating
+    global index, index_mmapped
+    with index_lock:
+        if index_mmapped:
+            index = faiss.read_index(INDEX_PATH)
+            index_mmapped = False
+
+def add_resources(df):
+    # Encode and insert new rows only
+    global resources_df
+    if df.empty:
+        return 0
+    embeddings = encode_resources(df)
+    with index_lock:
+        ensure_writable()
+        train_and_add(index, embeddings, df['resource_id'].values)
+        resources_df = compact_metadata(pd.concat([resources_df, df.set_index('resource_id', drop=False)]))
+        result_records.update(make_records(df))
+        bump_index_version()
+    return len(df)
+
+def delete_resources(resource_ids):
+    global resources_df
+    ids = np.asarray(list(resource_ids), dtype='int64')
+    if len(ids) == 0:
+        return 0
+    with index_lock:
+        ensure_writable()
+        removed = index.remove_ids(faiss.IDSelectorArray(ids))
+        resources_df = resources_df.drop(index=ids, errors='ignore')
+        for rid in ids.tolist():
+            result_records.pop(rid, None)
+        bump_index_version()
+    return int(removed)
+
+def update_resources(df):
+    # Re-encode edited rows and replace their vectors in place
+    global resources_df
+    if df.empty:
+        return 0
+    embeddings = encode_resources(df)
+    with index_lock:
+        ensure_writable()
+        delete_resources(df['resource_id'].values)
+        train_and_add(index, embeddings, df['resource_id'].values)
+        resources_df = compact_metadata(pd.concat([resources_df, df.set_index('resource_id', drop=False)]))
+        result_records.update(make_records(df))
+    return len(df)
+
+def supports_remove(idx):
+    # IndexRefine (rerank) and HNSW cannot remove vectors
+    inner = faiss.downcast_index(idx.index) if isinstance(idx, faiss.IndexIDMap2) else idx
+    return not isinstance(inner, (faiss.IndexRefine, faiss.IndexHNSW))
+
+def sync_index():
+    # Apply the catalogue delta since the last indexed watermark
+    global index_watermark
     if index is None:
         load_index()
-    
-    vec = model.encode([query_text])
-    D, I = index.search(np.array(vec).astype('float32'), k)
-    
+        return {"rebuilt": True}
+
+    with sync_lock:
+        if index_watermark is None:
+            changed = db.fetch_frame("SELECT * FROM resources")
+        else:
+            # updated_at is the writing transaction's start time, so a transaction that commits after
+            # the last sync can carry a stamp below the watermark: re-read an overlap window
+            changed = db.fetch_frame(
+                "SELECT * FROM resources WHERE updated_at > %(wm)s::timestamp - %(overlap)s * interval '1 second'",
+                params={"wm": index_watermark, "overlap": SYNC_OVERLAP_SECONDS})
+        live_ids = set(db.fetch_frame("SELECT resource_id FROM resources")['resource_id'].tolist())
+
+        with index_lock:
+            known = set(resources_df.index.tolist())
+            indexed_at = resources_df['updated_at'] if 'updated_at' in resources_df.columns else None
+        if indexed_at is not None and len(changed):
+            # Rows of the overlap that are already indexed at this version are not re-encoded
+            indexed_at = indexed_at[~indexed_at.index.duplicated(keep='last')]
+            seen = changed['resource_id'].map(indexed_at)
+            changed = changed[~(seen.notna() & (seen == changed['updated_at'])).values]
+        deleted = known - live_ids
+        new_rows = changed[~changed['resource_id'].isin(known)]
+        edited_rows = changed[changed['resource_id'].isin(known)]
+
+        if not (deleted or len(changed)):
+            return {"added": 0, "updated": 0, "deleted": 0}
+        if (deleted or len(edited_rows)) and not supports_remove(index):
+            print(f"{INDEX_TYPE} index cannot remove vectors; applying edits and deletes by rebuilding...")
+            build_index()
+            return {"rebuilt": True}
+
+        # Encoding happens outside index_lock, so searches keep running during a sync
+        try:
+            stats = {
+                "deleted": delete_resources(deleted),
+                "updated": update_resources(edited_rows),
+                "added": add_resources(new_rows),
+            }
+        except RuntimeError as e:
+            # Any other index type that cannot update in place: fall back to a full rebuild
+            print(f"Incremental update not supported by index ({e}). Rebuilding...")
+            build_index()
+            return {"rebuilt": True}
+
+        wm = max_watermark(changed)
+        with index_lock:
+            if wm is not None and (index_watermark is None or wm > index_watermark):
+                index_watermark = wm
+            save_index()
+
+    print(f"Index sync: {stats}")
+    return stats
+
+def hits_to_results(ids_row, dists_row, k):
+    # Assembled from result_records; score is cosine similarity (embeddings are unit-length)
     results = []
-    for idx in I[0]:
-        if idx < len(resources_df):
-            results.append(resources_df.iloc[idx].to_dict())
+    for rid, dist in zip(ids_row[:k], dists_row[:k]):
+        # -1 pads results when k exceeds the catalogue (or the filtered set)
+        if rid < 0:
+            continue
+        record = result_records.get(int(rid))
+        if record is None:
+            continue
+        hit = dict(record)
+        hit['distance'] = float(dist)
+        hit['score'] = 1.0 - float(dist) / 2.0
+        results.append(hit)
     return results
 
-def load_index():
-    global index, resources_df
-    if os.path.exists("faiss_index.pkl"):
-        with open("faiss_index.pkl", "rb") as f:
-            index, resources_df = pickle.load(f)
-    else:
-        build_index()
+# Filtered search: per-attribute id sets, rebuilt lazily whenever index_version changes
+FILTER_FIELDS = ('topic', 'content_type')
+# Allowed sets at or below this size are scored exactly instead of walking the ANN structure
+FILTER_EXACT_MAX = int(os.getenv('FILTER_EXACT_MAX', '4096'))
+attribute_sets = None   # (index_version, {field: {value: ids}}, (sorted difficulty, ids))
+
+def get_attribute_sets():
+    global attribute_sets
+    with index_lock:
+        if attribute_sets is None or attribute_sets[0] != index_version:
+            by_field = {}
+            for field in FILTER_FIELDS:
+                if field in resources_df.columns:
+                    by_field[field] = {
+                        value: np.sort(group.index.values.astype('int64'))
+                        for value, group in resources_df.groupby(field, observed=True)
+                    }
+            difficulty = None
+            if 'difficulty_level' in resources_df.columns:
+                col = resources_df['difficulty_level'].dropna().sort_values()
+                difficulty = (col.values, col.index.values.astype('int64'))
+            attribute_sets = (index_version, by_field, difficulty)
+        return attribute_sets
+
+def normalize_filters(filters):
+    # Drop empty values so equivalent requests share a cache key
+    if not filters:
+        return None
+    clean = {}
+    for field in FILTER_FIELDS:
+        value = filters.get(field)
+        if value:
+            clean[field] = tuple(sorted(value)) if isinstance(value, (list, tuple)) else (value,)
+    for bound in ('difficulty_min', 'difficulty_max'):
+        if filters.get(bound) is not None:
+            clean[bound] = float(filters[bound])
+    return clean or None
+
+def filter_ids(filters):
+    # Intersect precomputed id sets; returns the allowed resource_ids
+    _, by_field, difficulty = get_attribute_sets()
+    allowed = None
+    for field in FILTER_FIELDS:
+        if field in filters:
+            values = by_field.get(field, {})
+            ids = np.concatenate([values.get(v, np.empty(0, dtype='int64')) for v in filters[field]])
+            allowed = ids if allowed is None else np.intersect1d(allowed, ids, assume_unique=True)
+    if ('difficulty_min' in filters or 'difficulty_max' in filters) and difficulty is not None:
+        values, ids = difficulty
+        lo = np.searchsorted(values, filters.get('difficulty_min', -np.inf), side='left')
+        hi = np.searchsorted(values, filters.get('difficulty_max', np.inf), side='right')
+        ids = np.sort(ids[lo:hi])
+        allowed = ids if allowed is None else np.intersect1d(allowed, ids, assume_unique=True)
+    return allowed
+
+def supports_selector(idx):
+    # IndexPQ rejects SearchParameters outright (also as the base of a refine index)
+    inner = faiss.downcast_index(idx.index) if isinstance(idx, faiss.IndexIDMap2) else idx
+    if isinstance(inner, faiss.IndexRefine):
+        inner = faiss.downcast_index(inner.base_index)
+    return not isinstance(inner, faiss.IndexPQ)
+
+def make_search_params(sel, k, widen=False, idx=None):
+    # The parameter class must match the wrapped index type; widen=True makes
+    # IVF/HNSW search exhaustively enough to fill k slots under a selective filter
+    idx = index if idx is None else idx
+    inner = faiss.downcast_index(idx.index) if isinstance(idx, faiss.IndexIDMap2) else idx
+    if isinstance(inner, faiss.IndexRefine):
+        # Selector goes to the compressed base index; candidates are then re-scored.
+        # IDMap2 only translates a top-level selector, so map resource_ids to inner ids here.
+        base_sel = faiss.IDSelectorTranslated(idx.id_map, sel) if inner is not idx else sel
+        base = make_search_params(base_sel, k, widen, faiss.downcast_index(inner.base_index))
+        params = faiss.IndexRefineSearchParameters(k_factor=inner.k_factor, base_index_params=base)
+        params.referenced_objects = [sel, base_sel, base]  # keep SWIG pointers alive
+        return params
+    if isinstance(inner, faiss.IndexIVF):
+        nprobe = inner.nlist if widen else inner.nprobe
+        return faiss.SearchParametersIVF(sel=sel, nprobe=nprobe)
+    if isinstance(inner, faiss.IndexHNSW):
+        ef = max(inner.hnsw.efSearch, k)
+        if widen:
+            ef = max(ef * 8, min(inner.ntotal, 4096))
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=ef)
+    return faiss.SearchParameters(sel=sel)
+
+def exact_subset_search(vecs, k, allowed):
+    # Brute force over the allowed rows only; cheap because the set is small
+    sub = index.reconstruct_batch(allowed)
+    dist = (vecs ** 2).sum(axis=1)[:, None] - 2 * vecs @ sub.T + (sub ** 2).sum(axis=1)[None, :]
+    kk = min(k, len(allowed))
+    top = np.argpartition(dist, kk - 1, axis=1)[:, :kk]
+    order = np.take_along_axis(dist, top, axis=1).argsort(axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    D = np.full((len(vecs), k), np.inf, dtype='float32')
+    I = np.full((len(vecs), k), -1, dtype='int64')
+    D[:, :kk] = np.take_along_axis(dist, top, axis=1)
+    I[:, :kk] = allowed[top]
+    return D, I
+
+def post_filter_search(vecs, k, allowed):
+    # For indexes without selector support: over-fetch in proportion to how selective the
+    # filter is and drop excluded hits; rows still short of k are scored exactly instead
+    fetch = min(index.ntotal, max(4 * k, int(2 * k * index.ntotal / len(allowed))))
+    D, I = index.search(vecs, fetch)
+    keep = np.isin(I, allowed)
+    want = min(k, len(allowed))
+    if fetch < index.ntotal and (keep.sum(axis=1) < want).any():
+        return exact_subset_search(vecs, k, allowed)
+    out_D = np.full((len(vecs), k), np.inf, dtype='float32')
+    out_I = np.full((len(vecs), k), -1, dtype='int64')
+    for row in range(len(vecs)):
+        hits = np.flatnonzero(keep[row])[:k]
+        out_D[row, :len(hits)] = D[row, hits]
+        out_I[row, :len(hits)] = I[row, hits]
+    return out_D, out_I
+
+def search(vecs, k, filters=None):
+    # Filters are applied inside FAISS via an ID selector, so k slots are never
+    # wasted on excluded items the way post-filtering in pandas would (IndexPQ takes no
+    # selector and is post-filtered with over-fetch, see post_filter_search)
+    with index_lock:
+        if not filters:
+            return index.search(vecs, k)
+        allowed = filter_ids(filters)
+        if allowed is None:
+            return index.search(vecs, k)
+        if len(allowed) == 0:
+            return np.full((len(vecs), k), np.inf, dtype='float32'), np.full((len(vecs), k), -1, dtype='int64')
+        if len(allowed) <= FILTER_EXACT_MAX:
+            return exact_subset_search(vecs, k, allowed)
+        if not supports_selector(index):
+            return post_filter_search(vecs, k, allowed)
+        sel = faiss.IDSelectorBatch(allowed)
+        D, I = index.search(vecs, k, params=make_search_params(sel, k))
+        if (I == -1).any() and len(allowed) > (I != -1).sum(axis=1).min():
+            # Approximate index missed candidates in the probed region; search wider
+            D, I = index.search(vecs, k, params=make_search_params(sel, k, widen=True))
+        return D, I
+
+def recommend(query_text, k=3, filters=None):
+    if index is None:
+        load_index()
+
+    filters = normalize_filters(filters)
+    key = (normalize_query(query_text), k, tuple(sorted(filters.items())) if filters else None, index_version)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    vec = encode_query(query_text)
+    with index_lock:
+        D, I = search(vec.reshape(1, -1), k, filters)
+        results = hits_to_results(I[0], D[0], k)
+    result_cache.put(key, results)
+    return results
+
+def encode_queries(query_texts):
+    # Batched counterpart of encode_query: one model.encode call for all cache misses
+    keys = [normalize_query(q) for q in query_texts]
+    vecs = {}
+    for key in keys:
+        vec = embedding_cache.get(key)
+        if vec is not None:
+            vecs[key] = vec
+    missing = list(dict.fromkeys(key for key in keys if key not in vecs))
+    if missing:
+        encoded = np.asarray(get_model().encode(missing), dtype='float32')
+        for key, vec in zip(missing, encoded):
+            embedding_cache.put(key, vec)
+            vecs[key] = vec
+    return np.vstack([vecs[key] for key in keys])
+
+def recommend_batch(query_texts, ks):
+    # Many queries, one encode and one multi-query search; results keep input order
+    if index is None:
+        load_index()
+
+    version = index_version
+    out = [None] * len(query_texts)
+    pending = []
+    for i, (q, k) in enumerate(zip(query_texts, ks)):
+        cached = result_cache.get((normalize_query(q), k, None, version))
+        if cached is not None:
+            out[i] = cached
+        else:
+            pending.append(i)
+
+    if pending:
+        vecs = encode_queries([query_texts[i] for i in pending])
+        max_k = max(ks[i] for i in pending)
+        with index_lock:
+            D, I = index.search(vecs, max_k)
+            for row, i in enumerate(pending):
+                out[i] = hits_to_results(I[row], D[row], ks[i])
+        for i in pending:
+            result_cache.put((normalize_query(query_texts[i]), ks[i], None, version), out[i])
+    return out
+
+def load_index(mmap=INDEX_MMAP):
+    global index, resources_df, result_records, index_watermark, index_mmapped
+    if all(os.path.exists(p) for p in (INDEX_PATH, META_PATH, STATE_PATH)):
+        with open(STATE_PATH) as f:
+            state = json.load(f)
+        if state.get('model') == ENCODER_ID:
+            # IO_FLAG_MMAP only maps IVF inverted lists; IO_FLAG_MMAP_IFC maps the codes of every
+            # index type (flat, IDMap2, refine, HNSW storage) as well as the IVF lists. The two
+            # cannot be combined: IVF rejects IO_FLAG_MMAP | IO_FLAG_MMAP_IFC.
+            flags = faiss.IO_FLAG_MMAP_IFC if mmap else 0
+            loaded = faiss.read_index(INDEX_PATH, flags)
+            df = pd.read_parquet(META_PATH)
+            with index_lock:
+                index = loaded
+                index_mmapped = mmap
+                resources_df = compact_metadata(df.set_index('resource_id', drop=False))
+                result_records = make_records(df)
+                index_watermark = pd.Timestamp(state['watermark']) if state.get('watermark') else None
+                bump_index_version()
+            print(f"Loaded index with {index.ntotal} vectors (mmap={mmap}).")
+            return
+        print(f"Index was built with {state.get('model')}, not {ENCODER_ID}. Rebuilding...")
+    build_index()
 
 if __name__ == "__main__":
     build_index()
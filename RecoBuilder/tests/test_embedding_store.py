@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_store import EmbeddingStore
+
+MODEL = "test-model"
+
+def encode(texts):
+    return np.array([[len(t), i] for i, t in enumerate(texts)], dtype='float32')
+
+def nul_ending_text(store):
+    # About one text in 256 has a digest ending in a NUL byte
+    for i in range(10000):
+        text = f"text {i}"
+        if store.key(text).endswith(b'\0'):
+            return text
+    raise AssertionError("no digest ending in NUL found")
+
+def test_key_ending_in_nul_round_trips(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    text = nul_ending_text(store)
+    first, info = store.get_or_compute(["other", text], encode)
+    assert info == {"reused": 0, "computed": 2}
+
+    reopened = EmbeddingStore(str(tmp_path), MODEL)
+    assert store.key(text) in reopened.rows
+    again, info = reopened.get_or_compute([text, "other"], encode)
+    assert info == {"reused": 2, "computed": 0}
+    np.testing.assert_array_equal(again, first[::-1])
+
+def test_legacy_s16_keys_are_padded(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    text = nul_ending_text(store)
+    vectors, _ = store.get_or_compute([text], encode)
+    # Index as written before keys were stored as uint8 rows
+    np.savez(store.index_path + '.tmp.npz', keys=np.array([store.key(text)], dtype='S16'), dim=np.int64(2))
+    os.replace(store.index_path + '.tmp.npz', store.index_path)
+
+    reopened = EmbeddingStore(str(tmp_path), MODEL)
+    again, info = reopened.get_or_compute([text], encode)
+    assert info == {"reused": 1, "computed": 0}
+    np.testing.assert_array_equal(again, vectors)
@@ -0,0 +1,88 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+class Saturated(Exception):
+    pass
+
+class AdmissionController:
+    # Bounds concurrent upstream calls. Callers beyond max_concurrency wait FIFO in a queue capped
+    # at max_queue, for at most queue_timeout seconds; anything else is shed with Saturated so the
+    # caller can answer from the offline coach instead of piling onto an overloaded LLM.
+    # Plain counters and futures (no asyncio.Semaphore) so it can be created at import time on 3.9.
+    def __init__(self, max_concurrency, max_queue, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.queued_total = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._waiters = deque()
+
+    async def acquire(self):
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self._admit()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            raise Saturated("LLM queue full")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self.queued_total += 1
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            self.shed_timeout += 1
+            raise Saturated("LLM queue wait timed out")
+        except BaseException:
+            # Cancelled (client went away) right after a slot was handed over: give it back
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+        # The releasing caller handed its slot over, in_flight already counts us
+        self.admitted += 1
+
+    def _admit(self):
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter, otherwise free it
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "peak_in_flight": self.peak_in_flight,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
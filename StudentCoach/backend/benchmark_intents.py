@@ -0,0 +1,87 @@
+import argparse
+import random
+import time
+
+from intents import IntentMatcher, tokenize
+
+# Offline coach matching cost as the rule table grows: compiled token index vs the old
+# substring chain (one `any(kw in msg ...)` pass per rule).
+# Usage:
+#   python benchmark_intents.py --rules 100 1000 5000 --messages 2000
+
+WORDS = ("neural network gradient descent activation function overfitting dropout tensor matrix "
+         "vector loss optimizer epoch batch layer kernel pooling attention transformer token "
+         "embedding regression classification cluster python recursion pointer graph tree "
+         "sorting hashing database query index join schema cache thread process socket").split()
+
+def synthetic_rules(n_rules, keywords_per_rule, rng):
+    # Keywords are made-up words (plus some two-word phrases) so rule count, not vocabulary, drives cost
+    rules = []
+    for r in range(n_rules):
+        keywords = [f"kw{r}x{j}" for j in range(keywords_per_rule)]
+        keywords.append(f"{rng.choice(WORDS)} kw{r}phrase")
+        rules.append({"intent": f"intent_{r}", "keywords": keywords, "responses": [f"Reply for intent {r}, {{name}}."]})
+    return rules
+
+def synthetic_messages(n_messages, rules, rng, hit_rate=0.5):
+    messages = []
+    for _ in range(n_messages):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 25))]
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words)), rng.choice(rng.choice(rules)["keywords"]))
+        messages.append(" ".join(words))
+    return messages
+
+def substring_match(rules, message):
+    # The pre-table behaviour: one substring scan per rule, first rule wins
+    msg = message.lower()
+    for rule in rules:
+        if any(kw in msg for kw in rule["keywords"]):
+            return rule
+    return None
+
+def time_per_message(fn, messages, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for m in messages:
+            fn(m)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages) * 1e6  # microseconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline coach intent matching benchmark")
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--keywords-per-rule", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Word boundaries: none of these may fire the greeting
+    matcher = IntentMatcher([{"intent": "greeting", "keywords": ["hi", "hey"], "responses": ["Hello"]}])
+    for text in ["this is a thing", "they think", "which hierarchy"]:
+        assert matcher.match(text) is None, text
+    assert matcher.match("oh, hi there!") is not None
+
+    print(f"{'rules':>7} {'keywords':>9} {'compile_ms':>11} {'index_us/msg':>13} {'substring_us/msg':>17} {'speedup':>8} {'agree':>6}")
+    for n_rules in args.rules:
+        rng = random.Random(args.seed)
+        rules = synthetic_rules(n_rules, args.keywords_per_rule, rng)
+        messages = synthetic_messages(args.messages, rules, rng)
+
+        start = time.perf_counter()
+        matcher = IntentMatcher(rules)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        # Synthetic keywords never occur inside other words, so both matchers must agree
+        agree = all(matcher.match(m) is substring_match(rules, m) for m in messages[:200])
+        index_us = time_per_message(matcher.match, messages)
+        substring_us = time_per_message(lambda m: substring_match(rules, m), messages, repeat=1)
+        print(f"{n_rules:>7} {len(matcher.index):>9} {compile_ms:>11.1f} {index_us:>13.2f} "
+              f"{substring_us:>17.2f} {substring_us / index_us:>7.1f}x {str(agree):>6}")
+
+    tokens = sum(len(tokenize(m)) for m in messages) / len(messages)
+    print(f"(avg {tokens:.1f} tokens per message)")
+
+if __name__ == "__main__":
+    main()
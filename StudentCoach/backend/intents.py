@@ -0,0 +1,75 @@
+import json
+import random
+import re
+import string
+
+# Offline coach intent matching.
+# Rules (intent, keywords, response templates) live in a data file and are compiled once into a
+# token index: keyword phrase (word, or tuple of words) -> index of the first rule that owns it.
+# Matching tokenizes the message once and probes the index at each position for every distinct
+# phrase length, so the cost depends on message length, not on the number of rules, and
+# keywords only match whole words ("hi" no longer fires inside "this").
+# Earlier rules win when several intents match, like the old if-chain.
+
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+class _TemplateValues(dict):
+    # Unknown placeholders render as-is instead of raising in the middle of a fallback reply
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+class IntentMatcher:
+    def __init__(self, rules, fallback=None, defaults=None):
+        self.rules = rules
+        self.fallback = fallback or ["Tell me more about what you're trying to achieve."]
+        self.defaults = defaults or {}
+        self.index = {}
+        for priority, rule in enumerate(rules):
+            if not rule.get("responses"):
+                raise ValueError(f"Intent '{rule.get('intent')}' has no responses")
+            for keyword in rule.get("keywords", []):
+                phrase = tuple(tokenize(keyword))
+                if not phrase:
+                    raise ValueError(f"Intent '{rule.get('intent')}' has an empty keyword: {keyword!r}")
+                # Single words are stored as plain strings so the common probe skips building a tuple;
+                # setdefault keeps the earliest (highest priority) rule for shared keywords
+                self.index.setdefault(phrase[0] if len(phrase) == 1 else phrase, priority)
+            for template in rule["responses"]:
+                # Fail at load time on malformed templates, not when a student hits them
+                list(string.Formatter().parse(template))
+        self.phrase_lengths = sorted({1 if isinstance(p, str) else len(p) for p in self.index})
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["rules"], data.get("fallback"), data.get("defaults"))
+
+    def match(self, message: str):
+        # Returns the highest-priority matching rule, or None
+        tokens = tokenize(message)
+        best = None
+        index = self.index
+        for i in range(len(tokens)):
+            for n in self.phrase_lengths:
+                if i + n > len(tokens):
+                    break
+                priority = index.get(tokens[i] if n == 1 else tuple(tokens[i:i + n]))
+                if priority is not None and (best is None or priority < best):
+                    best = priority
+                    if best == 0:
+                        return self.rules[0]
+        return self.rules[best] if best is not None else None
+
+    def respond(self, message: str, context: dict):
+        rule = self.match(message)
+        templates = rule["responses"] if rule is not None else self.fallback
+        values = _TemplateValues(self.defaults)
+        values.update({k: v for k, v in context.items() if v is not None})
+        return random.choice(templates).format_map(values)
+
+    def stats(self):
+        return {"rules": len(self.rules), "keywords": len(self.index), "phrase_lengths": self.phrase_lengths}
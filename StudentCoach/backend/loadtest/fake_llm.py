@@ -0,0 +1,87 @@
+from fastapi import FastAPI, Body
+import asyncio
+import random
+import time
+import json
+import os
+
+# Local stand-in for an OpenAI-compatible chat completions API, for load testing.
+# Run:   python loadtest/fake_llm.py            (listens on :8001)
+# Point the coach at it:
+#   OPENAI_API_KEY=sk-local OPENAI_BASE_URL=http://localhost:8001/v1 python main.py
+
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "200"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+# Provider-side capacity: requests beyond it wait, so latency climbs under overload like a real API
+MAX_CONCURRENCY = int(os.getenv("FAKE_LLM_MAX_CONCURRENCY", "0"))   # 0 = unlimited
+SEED = os.getenv("FAKE_LLM_SEED")
+if SEED is not None:
+    random.seed(int(SEED))
+
+app = FastAPI()
+capacity = None
+
+@app.on_event("startup")
+async def startup_capacity():
+    global capacity
+    if MAX_CONCURRENCY > 0:
+        capacity = asyncio.Semaphore(MAX_CONCURRENCY)
+
+def fake_reply(messages):
+    prompt = messages[-1]["content"] if messages else ""
+    if "Generate a quiz" in prompt:
+        return json.dumps([
+            {"question": f"Sample question {i + 1}?", "options": ["A", "B", "C", "D"], "correct": 0}
+            for i in range(5)
+        ])
+    return "This is a simulated coach reply about " + prompt[:60]
+
+async def simulated_latency():
+    delay = max(0.0, random.gauss(LATENCY_MS, JITTER_MS)) / 1000
+    if capacity is None:
+        await asyncio.sleep(delay)
+        return
+    async with capacity:
+        await asyncio.sleep(delay)
+
+TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "30"))
+
+async def stream_reply(content, model):
+    # OpenAI-style chunk stream; latency applies before the first token
+    await simulated_latency()
+    for i, word in enumerate(content.split(" ")):
+        chunk = {
+            "id": "chatcmpl-local",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+    yield "data: [DONE]\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: dict = Body(...)):
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        await simulated_latency()
+        from fastapi.responses import JSONResponse
+        return JSONResponse({"error": {"message": "simulated overload"}}, status_code=503)
+    content = fake_reply(body.get("messages", []))
+    if body.get("stream"):
+        from fastapi.responses import StreamingResponse
+        return StreamingResponse(stream_reply(content, body.get("model", "fake")), media_type="text/event-stream")
+    await simulated_latency()
+    return {
+        "id": "chatcmpl-local",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("FAKE_LLM_PORT", "8001")))
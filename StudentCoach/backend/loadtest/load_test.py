@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import time
+import httpx
+
+# Concurrent load against a running coach backend.
+#   python loadtest/load_test.py --endpoint chat --concurrency 50 --requests 500
+# Reports throughput, latency percentiles, errors and how many replies came from the
+# offline fallback instead of the LLM. For chat/stream, time-to-first-token is reported too.
+
+def payload(endpoint, i, topics=5):
+    # Quiz topics cycle through `topics` names: few topics exercise the quiz cache, many bypass it
+    if endpoint == "quiz":
+        return {"topic": f"topic {i % topics}", "count": 5}
+    return {"message": f"Can you explain neural networks? ({i})", "student_id": 1}
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+async def stream_once(client, url, body):
+    # Returns (ttft seconds, source) for one SSE chat stream
+    start = time.perf_counter()
+    ttft = None
+    source = None
+    async with client.stream("POST", f"{url}/chat/stream", json=body) as resp:
+        if resp.status_code != 200:
+            raise httpx.HTTPStatusError("bad status", request=resp.request, response=resp)
+        async for line in resp.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if "token" in event and ttft is None:
+                ttft = time.perf_counter() - start
+            if event.get("done"):
+                source = event.get("source")
+    return ttft, source
+
+async def run(url, endpoint, concurrency, total, topics=5):
+    latencies = []
+    ttfts = []
+    errors = 0
+    fallbacks = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker(client):
+        nonlocal errors, fallbacks
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            if endpoint == "chat/stream":
+                try:
+                    ttft, source = await stream_once(client, url, payload("chat", i))
+                    latencies.append(time.perf_counter() - start)
+                    if ttft is not None:
+                        ttfts.append(ttft)
+                    if source == "OfflineCoach":
+                        fallbacks += 1
+                except httpx.HTTPError:
+                    errors += 1
+                continue
+            try:
+                resp = await client.post(f"{url}/{endpoint}", json=payload(endpoint, i, topics))
+                latencies.append(time.perf_counter() - start)
+                if resp.status_code != 200:
+                    errors += 1
+                elif resp.headers.get("x-coach-source", "").startswith("Offline") or \
+                        (endpoint == "chat" and resp.json().get("source") == "OfflineCoach"):
+                    fallbacks += 1
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ttfts.sort()
+    return {
+        "ttft_p50_ms": 1000 * percentile(ttfts, 50) if ttfts else None,
+        "ttft_p95_ms": 1000 * percentile(ttfts, 95) if ttfts else None,
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_rps": total / elapsed,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+        "errors": errors,
+        "fallback_rate": fallbacks / total if total else 0.0,
+    }
+
+def print_report(r):
+    print(f"{r['endpoint']:<6} c={r['concurrency']:<4} n={r['requests']:<6} "
+          f"{r['throughput_rps']:8.1f} req/s  p50={r['p50_ms']:7.1f}ms p95={r['p95_ms']:7.1f}ms "
+          f"p99={r['p99_ms']:7.1f}ms errors={r['errors']} fallback={r['fallback_rate']:.1%}")
+    if r.get('ttft_p50_ms') is not None:
+        print(f"       time-to-first-token p50={r['ttft_p50_ms']:.1f}ms p95={r['ttft_p95_ms']:.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="StudentCoach load test")
+    parser.add_argument('--url', default="http://localhost:5000")
+    parser.add_argument('--endpoint', choices=["chat", "chat/stream", "quiz"], default="chat")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--topics', type=int, default=5, help="distinct quiz topics")
+    args = parser.parse_args()
+    print_report(asyncio.run(run(args.url, args.endpoint, args.concurrency, args.requests, args.topics)))
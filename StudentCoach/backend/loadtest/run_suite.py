@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+from load_test import run, print_report
+
+# Reproducible load-test suite for StudentCoach.
+# Starts the fake LLM (fixed seed, latency and provider capacity) and, for every admission profile
+# and scenario, a fresh coach process (cold caches). Then it drives the scenario and records
+# throughput, latency percentiles, fallback rate and the coach's admission counters.
+#   python loadtest/run_suite.py                       # everything, report in loadtest_report.json
+#   python loadtest/run_suite.py --quick --profiles bounded --scenarios chat-spike quiz-cold
+# The load generator shares the machine with the coach; compare profiles on the same box, and give
+# it a few spare cores, or client-side overhead will dominate the high-concurrency scenarios.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(HERE)
+
+# name -> (endpoint, concurrency, requests, distinct quiz topics)
+SCENARIOS = {
+    "chat-steady":  ("chat", 16, 320, 5),
+    "chat-spike":   ("chat", 256, 1024, 5),
+    "quiz-hot":     ("quiz", 128, 512, 8),      # a class asking for the same few quizzes
+    "quiz-cold":    ("quiz", 128, 512, 512),    # every request a new topic: no cache help
+    "stream-spike": ("chat/stream", 128, 256, 5),
+}
+
+# Coach admission settings; "unbounded" is the pre-admission-control behaviour
+PROFILES = {
+    "bounded":   {"LLM_MAX_CONCURRENCY": "32", "LLM_MAX_QUEUE": "64", "LLM_QUEUE_TIMEOUT": "2"},
+    "unbounded": {"LLM_MAX_CONCURRENCY": "1000000", "LLM_MAX_QUEUE": "0", "LLM_QUEUE_TIMEOUT": "0"},
+}
+
+def start_process(args, cwd, env, log_path):
+    log = open(log_path, "w")
+    return subprocess.Popen(args, cwd=cwd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+
+def wait_until_up(url, proc, log_path, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    with open(log_path) as f:
+        print(f.read()[-2000:])
+    raise RuntimeError(f"{url} did not come up")
+
+def stop_process(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="StudentCoach load-test suite against a local fake LLM")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-capacity", type=int, default=64, help="fake LLM concurrent requests")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--coach-port", type=int, default=5055)
+    parser.add_argument("--llm-port", type=int, default=8011)
+    parser.add_argument("--quick", action="store_true", help="a quarter of the requests per scenario")
+    parser.add_argument("--output", default="loadtest_report.json")
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix="coach-loadtest-")
+    llm_env = {
+        "FAKE_LLM_PORT": str(args.llm_port),
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_JITTER_MS": str(args.llm_jitter_ms),
+        "FAKE_LLM_MAX_CONCURRENCY": str(args.llm_capacity),
+        "FAKE_LLM_ERROR_RATE": str(args.llm_error_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+    }
+    coach_url = f"http://127.0.0.1:{args.coach_port}"
+    llm_log = os.path.join(log_dir, "fake_llm.log")
+    llm = start_process([sys.executable, "fake_llm.py"], HERE, llm_env, llm_log)
+    results = []
+    try:
+        # Any HTTP answer (even a 404/405) means the fake LLM is listening
+        wait_until_up(f"http://127.0.0.1:{args.llm_port}/v1/chat/completions", llm, llm_log)
+        for profile in args.profiles:
+            for name in args.scenarios:
+                endpoint, concurrency, total, topics = SCENARIOS[name]
+                if args.quick:
+                    total = max(concurrency, total // 4)
+                coach_env = {
+                    **PROFILES[profile],
+                    "OPENAI_API_KEY": "sk-loadtest",
+                    "OPENAI_BASE_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+                    "LLM_MAX_RETRIES": "0",   # count upstream failures as fallbacks, not hidden retries
+                    "LLM_MAX_CONNECTIONS": "1000",
+                    "LLM_MAX_KEEPALIVE": "1000",
+                    "OFFLINE_TOKEN_DELAY": "0.02",
+                }
+                coach_log = os.path.join(log_dir, f"coach-{profile}-{name}.log")
+                coach = start_process([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.coach_port),
+                                       "--log-level", "warning"], BACKEND_DIR, coach_env, coach_log)
+                try:
+                    wait_until_up(coach_url + "/", coach, coach_log)
+                    report = asyncio.run(run(coach_url, endpoint, concurrency, total, topics))
+                    admission = httpx.get(coach_url + "/metrics", timeout=5).json()["llm_admission"]
+                finally:
+                    stop_process(coach)
+                report.update({"scenario": name, "profile": profile, "admission": admission})
+                results.append(report)
+                print(f"[{profile}] {name}")
+                print_report(report)
+                print(f"       shed: queue_full={admission['shed_queue_full']} timeout={admission['shed_timeout']} "
+                      f"peak_in_flight={admission['peak_in_flight']}")
+    finally:
+        stop_process(llm)
+
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "results": results}, f, indent=2)
+    print(f"Report written to {args.output} (process logs in {log_dir})")
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,93 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from collections import deque
+import asyncio
+import json
+import time
 import os
-import random
 from dotenv import load_dotenv
-import consul
+from edupath import discovery
+
+from admission import AdmissionController, Saturated
+from cache import AsyncTTLCache
+from intents import IntentMatcher
 
 load_dotenv()
 
 # Try importing OpenAI, fail gracefully
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
+    import httpx
     HAS_OPENAI = True
 except ImportError:
     HAS_OPENAI = False
 
+try:
+    import asyncpg
+    HAS_ASYNCPG = True
+except ImportError:
+    HAS_ASYNCPG = False
+
 app = FastAPI()
 
-# Consul Configuration
-CONSUL_HOST = os.getenv("CONSUL_HOST", "consul")
-CONSUL_PORT = int(os.getenv("CONSUL_PORT", 8500))
-SERVICE_ID = "student-coach-backend-5000"
+# LLM Configuration
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))            # seconds per call
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+
+# Admission control: at most LLM_MAX_CONCURRENCY upstream calls at once, LLM_MAX_QUEUE more
+# waiting up to LLM_QUEUE_TIMEOUT seconds; everything beyond is shed to the offline coach
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "2"))
+llm_admission = AdmissionController(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+
+# One application-scoped async client: keep-alive pooled connections, never blocks the event loop
+llm_client = None
 
 @app.on_event("startup")
-def startup_event():
-    try:
-        c = consul.Consul(host=CONSUL_HOST, port=CONSUL_PORT)
-        c.agent.service.register(
-            name="student-coach-backend",
-            service_id=SERVICE_ID,
-            address="student-coach-backend",
-            port=5000,
-            check={
-                "http": "http://student-coach-backend:5000/", # Health check via root endpoint which returns status ok
-                "interval": "10s",
-                "timeout": "5s"
-            }
+async def startup_llm_client():
+    global llm_client
+    if HAS_OPENAI and OPENAI_API_KEY and OPENAI_API_KEY.startswith("sk-"):
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                max_keepalive_connections=LLM_MAX_KEEPALIVE),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
         )
-        print("Registered with Consul")
-    except Exception as e:
-        print(f"Consul registration failed: {e}")
+        llm_client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL,
+                                 max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT,
+                                 http_client=http_client)
+        print(f"LLM client ready ({LLM_MODEL} @ {OPENAI_BASE_URL})")
+
+@app.on_event("shutdown")
+async def shutdown_llm_client():
+    if llm_client is not None:
+        await llm_client.close()
+
+# Consul: registration runs in a background thread (retrying until Consul answers), so startup
+# never waits on it; health check via root endpoint which returns status ok
+SERVICE_PORT = int(os.getenv("PORT", "5000"))
+
+@app.on_event("startup")
+def startup_event():
+    discovery.register_in_background("student-coach-backend", SERVICE_PORT, check_path="/")
+
+# RecoBuilder replicas are discovered through Consul and called round-robin over pooled
+# keep-alive connections; RECO_URL is used until Consul reports healthy instances
+COACH_RECOMMENDATIONS = os.getenv("COACH_RECOMMENDATIONS", "1") != "0"
+RECO_TIMEOUT = float(os.getenv("RECO_TIMEOUT", "1.5"))
+reco_client = discovery.ServiceClient("reco-builder", fallback_url=os.getenv("RECO_URL", "http://reco-builder:5003"),
+                                      timeout=RECO_TIMEOUT)
+
+@app.on_event("shutdown")
+async def shutdown_reco_client():
+    await reco_client.aclose()
 
 app.add_middleware(
     CORSMiddleware,
@@ -53,119 +101,376 @@ class ChatRequest(BaseModel):
     message: str
     student_id: int = 1
 
-# Mock DB for Context
-STUDENT_CONTEXT = {
-    1: {"name": "Alex", "failed_quiz": "Neural Networks", "weak_area": "Activation Functions"}
-}
+# --- STUDENT CONTEXT ---
+# Name, profile type, weak areas and failed quizzes come from students / student_profiles / grades
+# through an async pool, with a per-student TTL cache so a conversation hits the DB once.
+DB_USER = os.getenv("POSTGRES_USER", "admin")
+DB_PASS = os.getenv("POSTGRES_PASSWORD", "adminpassword")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5433" if DB_HOST == "localhost" else "5432"))
+DB_NAME = os.getenv("POSTGRES_DB", "edupath_db")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "2"))     # seconds; chat must not hang on the DB
 
-# --- OFFLINE SIMULATOR (The "Mock" LLM) ---
-def offline_chat(message: str, context: dict) -> str:
-    msg = message.lower()
-    
-    # Greetings
-    if any(x in msg for x in ["hi", "hello", "hey"]):
-        return f"Hello {context['name']}! I'm your AI Coach. I see you're working on Neural Networks. How can I help?"
+STUDENT_CONTEXT_TTL = float(os.getenv("STUDENT_CONTEXT_TTL", "300"))   # seconds
+STUDENT_CONTEXT_CACHE_SIZE = int(os.getenv("STUDENT_CONTEXT_CACHE_SIZE", "10000"))
+WEAK_SCORE_THRESHOLD = float(os.getenv("WEAK_SCORE_THRESHOLD", "0.6"))  # score/max_score below this is weak
+CONTEXT_MAX_ITEMS = 3
 
-    # Contextual Help
-    if "activation" in msg or "relu" in msg or "sigmoid" in msg:
-        return "Activation functions determine if a neuron should fire. ReLU is efficient for hidden layers, while Sigmoid is often used for outputs. Do you want a quiz on this?"
+DEFAULT_CONTEXT = {"name": "Student", "profile_type": None, "weak_areas": [], "failed_quizzes": [],
+                   "weak_area": None, "failed_quiz": None, "recommended": []}
 
-    if "neural" in msg or "network" in msg:
-        return "Neural Networks mimic the human brain. They rely on layers of nodes. I noticed you struggled with the last quiz on this. Shall we review?"
+db_pool = None
+student_context_cache = AsyncTTLCache(maxsize=STUDENT_CONTEXT_CACHE_SIZE, ttl=STUDENT_CONTEXT_TTL)
 
-    if "quiz" in msg or "test" in msg:
-        return "I can generate a quiz for you. Just say 'Start Quiz' in the chat!"
+@app.on_event("startup")
+async def startup_db_pool():
+    global db_pool
+    if not HAS_ASYNCPG:
+        print("asyncpg not installed; using default student context")
+        return
+    try:
+        db_pool = await asyncpg.create_pool(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS,
+                                            database=DB_NAME, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX,
+                                            command_timeout=DB_COMMAND_TIMEOUT)
+        print(f"DB pool ready ({DB_HOST}:{DB_PORT}/{DB_NAME}, {DB_POOL_MIN}-{DB_POOL_MAX} connections)")
+    except Exception as e:
+        print(f"DB pool unavailable, using default student context: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_db_pool():
+    if db_pool is not None:
+        await db_pool.close()
+
+STUDENT_QUERY = """
+    SELECT s.name, p.profile_type
+    FROM students s
+    LEFT JOIN student_profiles p ON p.student_id = s.id
+    WHERE s.id = $1
+"""
+# Topics the student averages below the threshold on, weakest first
+WEAK_AREAS_QUERY = """
+    SELECT COALESCE(q.topic, g.quiz_title) AS topic
+    FROM grades g
+    LEFT JOIN quizzes q ON q.id = g.quiz_id
+    WHERE g.student_id = $1
+    GROUP BY COALESCE(q.topic, g.quiz_title)
+    HAVING AVG(g.score::float / NULLIF(g.max_score, 0)) < $2
+    ORDER BY AVG(g.score::float / NULLIF(g.max_score, 0))
+    LIMIT $3
+"""
+# Individual failed attempts, most recent first
+FAILED_QUIZZES_QUERY = """
+    SELECT COALESCE(q.title, g.quiz_title) AS title
+    FROM grades g
+    LEFT JOIN quizzes q ON q.id = g.quiz_id
+    WHERE g.student_id = $1 AND g.score::float / NULLIF(g.max_score, 0) < $2
+    ORDER BY g.submitted_at DESC NULLS LAST
+    LIMIT $3
+"""
+
+async def load_recommended_resources(student_id: int):
+    # Titles of RecoBuilder's picks for this student; [] when no replica answers in time
+    if not COACH_RECOMMENDATIONS:
+        return []
+    try:
+        resp = await reco_client.arequest("POST", "/recommend", json={"student_id": student_id, "k": CONTEXT_MAX_ITEMS})
+        resp.raise_for_status()
+        return [r["title"] for r in resp.json() if isinstance(r, dict) and r.get("title")]
+    except Exception as e:
+        print(f"Recommendations unavailable for {student_id}: {e}")
+        return []
+
+async def load_student_context(student_id: int):
+    # None on DB errors, so a failed load is not cached; recommendations load alongside the DB queries
+    recommended = asyncio.ensure_future(load_recommended_resources(student_id))
+    try:
+        async with db_pool.acquire() as conn:
+            student = await conn.fetchrow(STUDENT_QUERY, student_id)
+            if student is not None:
+                weak = await conn.fetch(WEAK_AREAS_QUERY, student_id, WEAK_SCORE_THRESHOLD, CONTEXT_MAX_ITEMS)
+                failed = await conn.fetch(FAILED_QUIZZES_QUERY, student_id, WEAK_SCORE_THRESHOLD, CONTEXT_MAX_ITEMS)
+    except Exception as e:
+        recommended.cancel()
+        print(f"Student context load failed for {student_id}: {e}")
+        return None
+    if student is None:
+        recommended.cancel()
+        return dict(DEFAULT_CONTEXT)
+
+    weak_areas = [r["topic"] for r in weak if r["topic"]]
+    failed_quizzes = list(dict.fromkeys(r["title"] for r in failed if r["title"]))
+    return {
+        "name": student["name"] or DEFAULT_CONTEXT["name"],
+        "profile_type": student["profile_type"],
+        "weak_areas": weak_areas,
+        "failed_quizzes": failed_quizzes,
+        "weak_area": weak_areas[0] if weak_areas else None,
+        "failed_quiz": failed_quizzes[0] if failed_quizzes else None,
+        "recommended": await recommended,
+    }
+
+async def get_student_context(student_id: int):
+    if db_pool is None:
+        return DEFAULT_CONTEXT
+    context = await student_context_cache.get_or_load(student_id, lambda: load_student_context(student_id))
+    return context or DEFAULT_CONTEXT
+
+# --- OFFLINE SIMULATOR (The "Mock" LLM) ---
+# Intents, keywords and reply templates live in intents.json, compiled once into a token index
+INTENTS_PATH = os.getenv("INTENTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json"))
+intent_matcher = IntentMatcher.from_file(INTENTS_PATH)
 
-    if "help" in msg or "stuck" in msg:
-        return f"Don't panic! based on your profile, you should watch the video on '{context['weak_area']}'. It's in Module 1."
+def offline_chat(message: str, context: dict) -> str:
+    return intent_matcher.respond(message, context)
+
+COACH_SYSTEM_PROMPT = "You are a helpful student coach for a CS student learning AI."
 
-    if "joke" in msg:
-        return "Why did the neural network break up with the perceptron? Because it needed more space (dimensionality)!"
+def coach_prompt(context: dict) -> str:
+    prompt = f"{COACH_SYSTEM_PROMPT} You are talking to {context['name']}."
+    if context.get("profile_type"):
+        prompt += f" Their learner profile is '{context['profile_type']}'."
+    if context.get("weak_areas"):
+        prompt += f" Weak areas: {', '.join(context['weak_areas'])}."
+    if context.get("failed_quizzes"):
+        prompt += f" Recently failed quizzes: {', '.join(context['failed_quizzes'])}."
+    if context.get("recommended"):
+        prompt += f" Resources recommended for them: {', '.join(context['recommended'])}."
+    return prompt
 
-    # Fallback Generic "AI-like" responses
-    fallbacks = [
-        "That's a deep topic. Could you be more specific?",
-        "Interesting. How does that apply to your current project?",
-        "I can help you with that. Break it down into smaller steps.",
-        "Tell me more about what you're trying to achieve."
+def chat_messages(message: str, context: dict):
+    return [
+        {"role": "system", "content": coach_prompt(context)},
+        {"role": "user", "content": message}
     ]
-    return random.choice(fallbacks)
 
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest = Body(...)):
+async def chat_endpoint(response: Response, request: ChatRequest = Body(...)):
     print(f"Received chat: {request.message}")
-    
-    # Check for Real API Key
-    api_key = os.getenv("OPENAI_API_KEY")
-    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-    model = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
-    
-    if HAS_OPENAI and api_key and api_key.startswith("sk-"):
+    context = await get_student_context(request.student_id)
+
+    # Use the real LLM when a client is configured and it has capacity
+    if llm_client is not None:
         try:
-            client = OpenAI(api_key=api_key, base_url=base_url)
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful student coach for a CS student learning AI."},
-                    {"role": "user", "content": request.message}
-                ]
-            )
-            return {"response": completion.choices[0].message.content, "source": f"AI ({model})"}
+            async with llm_admission.slot():
+                completion = await llm_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=chat_messages(request.message, context),
+                    timeout=LLM_TIMEOUT
+                )
+            response.headers["X-Coach-Source"] = f"AI ({LLM_MODEL})"
+            return {"response": completion.choices[0].message.content, "source": f"AI ({LLM_MODEL})"}
+        except Saturated:
+            # Shed: answer offline right away instead of queueing behind an overloaded LLM
+            pass
         except Exception as e:
             print(f"OpenAI Error: {e}")
             # Fallback to offline if API fails
             pass
     
     # Use Offline Simulator
-    response_text = offline_chat(request.message, STUDENT_CONTEXT.get(request.student_id, {"name": "Student"}))
+    response_text = offline_chat(request.message, context)
+    response.headers["X-Coach-Source"] = "OfflineCoach"
     return {"response": response_text, "source": "OfflineCoach"}
 
+# --- STREAMING CHAT (Server-Sent Events) ---
+# Protocol, shared by the LLM and the offline coach:
+#   data: {"token": "..."}                      one per chunk
+#   data: {"done": true, "source": "..."}       last event (may carry "error")
+OFFLINE_TOKEN_DELAY = float(os.getenv("OFFLINE_TOKEN_DELAY", "0.02"))  # pacing for the offline stream
+
+stream_stats = {
+    "open_streams": 0,
+    "streams_total": 0,
+    "client_disconnects": 0,
+    "llm_fallbacks": 0,
+}
+ttft_samples = deque(maxlen=1000)  # seconds, most recent streams
+
+def sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def offline_tokens(message: str, context: dict):
+    text = offline_chat(message, context)
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        yield word if i == 0 else " " + word
+        await asyncio.sleep(OFFLINE_TOKEN_DELAY)
+
+async def chat_event_stream(request: Request, chat: ChatRequest):
+    start = time.perf_counter()
+    first_token = True
+    source = "OfflineCoach"
+    upstream = None
+    finished = False
+    stream_stats["open_streams"] += 1
+    stream_stats["streams_total"] += 1
+
+    def record_ttft():
+        nonlocal first_token
+        if first_token:
+            ttft_samples.append(time.perf_counter() - start)
+            first_token = False
+
+    try:
+        context = await get_student_context(chat.student_id)
+        if llm_client is not None:
+            try:
+                # The slot is held for the whole stream: the upstream call is busy until it ends
+                async with llm_admission.slot():
+                    upstream = await llm_client.chat.completions.create(
+                        model=LLM_MODEL,
+                        messages=chat_messages(chat.message, context),
+                        timeout=LLM_TIMEOUT,
+                        stream=True
+                    )
+                    source = f"AI ({LLM_MODEL})"
+                    async for chunk in upstream:
+                        if await request.is_disconnected():
+                            return
+                        token = chunk.choices[0].delta.content if chunk.choices else None
+                        if token:
+                            record_ttft()
+                            yield sse({"token": token})
+                    yield sse({"done": True, "source": source})
+                    finished = True
+                    return
+            except Saturated:
+                stream_stats["llm_fallbacks"] += 1
+            except Exception as e:
+                print(f"OpenAI Stream Error: {e}")
+                if not first_token:
+                    # Tokens already went out; tell the client instead of switching voices mid-reply
+                    yield sse({"done": True, "source": source, "error": "stream interrupted"})
+                    finished = True
+                    return
+                stream_stats["llm_fallbacks"] += 1
+                source = "OfflineCoach"
+
+        async for token in offline_tokens(chat.message, context):
+            if await request.is_disconnected():
+                return
+            record_ttft()
+            yield sse({"token": token})
+        yield sse({"done": True, "source": source})
+        finished = True
+    finally:
+        # Runs on normal completion, client disconnect and task cancellation alike
+        if not finished:
+            stream_stats["client_disconnects"] += 1
+        if upstream is not None:
+            await upstream.close()
+        stream_stats["open_streams"] -= 1
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: Request, chat: ChatRequest = Body(...)):
+    print(f"Received streaming chat: {chat.message}")
+    return StreamingResponse(
+        chat_event_stream(request, chat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+def metrics_endpoint():
+    samples = sorted(ttft_samples)
+    def pct(p):
+        return round(1000 * samples[min(len(samples) - 1, int(p / 100 * len(samples)))], 1) if samples else None
+    return {
+        **stream_stats,
+        "ttft_ms": {"count": len(samples), "p50": pct(50), "p95": pct(95), "p99": pct(99)},
+        "llm_admission": llm_admission.stats(),
+        "quiz_cache": quiz_cache.stats(),
+        "student_context_cache": student_context_cache.stats(),
+        "reco_client": reco_client.stats(),
+        "db_pool": {"size": db_pool.get_size(), "idle": db_pool.get_idle_size()} if db_pool is not None else None,
+        "quiz_prewarm": {**prewarm_stats, "running": len(prewarm_tasks)},
+    }
+
 class QuizRequest(BaseModel):
     topic: str
     count: int = 5
 
-@app.post("/quiz")
-async def generate_quiz_endpoint(request: QuizRequest = Body(...)):
-    topic = request.topic.lower()
-    count = request.count
-    print(f"Generating quiz for: {topic} ({count} questions)")
+class QuizPrewarmRequest(BaseModel):
+    topics: list
+    count: int = 5
 
-    # 1. Try OpenAI/DeepSeek
-    api_key = os.getenv("OPENAI_API_KEY")
-    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-    model = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# --- QUIZ CACHE ---
+# Validated LLM question sets keyed by normalized (topic, count); a whole class asking for the
+# same quiz at once shares one in-flight generation. Offline mock quizzes are never cached.
+QUIZ_CACHE_SIZE = int(os.getenv("QUIZ_CACHE_SIZE", "512"))
+QUIZ_CACHE_TTL = float(os.getenv("QUIZ_CACHE_TTL", "21600"))      # seconds (6h)
+QUIZ_MAX_COUNT = int(os.getenv("QUIZ_MAX_COUNT", "20"))
+QUIZ_PREWARM_CONCURRENCY = int(os.getenv("QUIZ_PREWARM_CONCURRENCY", "4"))
 
-    if HAS_OPENAI and api_key and api_key.startswith("sk-"):
-        try:
-            client = OpenAI(api_key=api_key, base_url=base_url)
-            prompt = f"""
-            Generate a quiz about {topic} with {count} multiple-choice questions.
-            Return ONLY raw JSON. Format:
-            [
-              {{"question": "Text", "options": ["A", "B", "C", "D"], "correct": 0}}
-            ]
-            """
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}]
+quiz_cache = AsyncTTLCache(maxsize=QUIZ_CACHE_SIZE, ttl=QUIZ_CACHE_TTL)
+prewarm_stats = {"requested": 0, "generated": 0, "skipped": 0, "failed": 0}
+# The event loop only keeps weak references to tasks: hold running pre-warms here until they finish
+prewarm_tasks = set()
+
+def prewarm_done(task):
+    prewarm_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Quiz pre-warm failed: {task.exception()!r}")
+
+def quiz_key(topic: str, count: int):
+    # "  Neural   Networks " and "neural networks" are the same quiz
+    return " ".join(topic.lower().split()), max(1, min(count, QUIZ_MAX_COUNT))
+
+def validate_quiz(questions, count: int):
+    # Only well-formed question sets are served from (and stored in) the cache
+    if not isinstance(questions, list) or len(questions) < count:
+        return None
+    valid = []
+    for q in questions[:count]:
+        if not isinstance(q, dict) or not isinstance(q.get("question"), str):
+            return None
+        options = q.get("options")
+        correct = q.get("correct")
+        if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, str) for o in options):
+            return None
+        if not isinstance(correct, int) or isinstance(correct, bool) or not 0 <= correct < len(options):
+            return None
+        valid.append({"question": q["question"], "options": options, "correct": correct})
+    return valid
+
+async def generate_quiz_llm(topic: str, count: int):
+    # Returns a validated question list, or None when the LLM fails or answers malformed JSON
+    try:
+        prompt = f"""
+        Generate a quiz about {topic} with {count} multiple-choice questions.
+        Return ONLY raw JSON. Format:
+        [
+          {{"question": "Text", "options": ["A", "B", "C", "D"], "correct": 0}}
+        ]
+        """
+        async with llm_admission.slot():
+            completion = await llm_client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=LLM_TIMEOUT
             )
-            content = completion.choices[0].message.content
-            # Clean up potential markdown code blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-            
-            import json
-            return json.loads(content.strip())
-        except Exception as e:
-            print(f"OpenAI Quiz Error: {e}")
-            # Fallback to offline
-            pass
+        content = completion.choices[0].message.content
+        # Clean up potential markdown code blocks
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0]
+        elif "```" in content:
+            content = content.split("```")[1].split("```")[0]
 
-    # 2. Offline Smart-Mock (Python Version)
-    import json
-    
+        questions = validate_quiz(json.loads(content.strip()), count)
+        if questions is None:
+            print(f"OpenAI Quiz Error: invalid question set for '{topic}'")
+        return questions
+    except Saturated:
+        # Shed under load: this request (and its single-flight followers) get the offline quiz
+        return None
+    except Exception as e:
+        print(f"OpenAI Quiz Error: {e}")
+        return None
+
+def offline_quiz(topic: str, count: int):
+    # Offline Smart-Mock (Python Version)
     if "node" in topic:
          return [
             { "question": "Who is the creator of Node.js?", "options": ["Ryan Dahl", "Brendan Eich", "Guido van Rossum", "James Gosling"], "correct": 0 },
@@ -184,6 +489,53 @@ async def generate_quiz_endpoint(request: QuizRequest = Body(...)):
       { "question": f"Is {topic} outdated?", "options": ["No", "Yes", "Perhaps", "Depends"], "correct": 0 }
     ]
 
+async def cached_quiz(topic: str, count: int):
+    key = quiz_key(topic, count)
+    return await quiz_cache.get_or_load(key, lambda: generate_quiz_llm(*key))
+
+@app.post("/quiz")
+async def generate_quiz_endpoint(response: Response, request: QuizRequest = Body(...)):
+    topic, count = quiz_key(request.topic, request.count)
+    print(f"Generating quiz for: {topic} ({count} questions)")
+
+    # 1. Try OpenAI/DeepSeek, through the cache
+    if llm_client is not None:
+        questions = await cached_quiz(topic, count)
+        if questions is not None:
+            response.headers["X-Coach-Source"] = f"AI ({LLM_MODEL})"
+            return questions
+
+    # 2. Fallback to offline
+    response.headers["X-Coach-Source"] = "OfflineCoach"
+    return offline_quiz(topic, count)
+
+async def prewarm_quizzes(topics, count: int):
+    # Generate quizzes ahead of class sessions; a few at a time so live traffic keeps LLM headroom
+    sem = asyncio.Semaphore(QUIZ_PREWARM_CONCURRENCY)
+
+    async def warm(topic):
+        key = quiz_key(topic, count)
+        if key in quiz_cache:
+            prewarm_stats["skipped"] += 1
+            return
+        async with sem:
+            questions = await cached_quiz(*key)
+        prewarm_stats["generated" if questions is not None else "failed"] += 1
+
+    await asyncio.gather(*(warm(t) for t in topics))
+    print(f"Quiz pre-warm done: {prewarm_stats}")
+
+@app.post("/quiz/prewarm", status_code=202)
+async def prewarm_quiz_endpoint(request: QuizPrewarmRequest = Body(...)):
+    if llm_client is None:
+        raise HTTPException(status_code=503, detail="No LLM configured; nothing to pre-warm")
+    topics = list(dict.fromkeys(quiz_key(str(t), request.count)[0] for t in request.topics if str(t).strip()))
+    prewarm_stats["requested"] += len(topics)
+    task = asyncio.create_task(prewarm_quizzes(topics, request.count))
+    prewarm_tasks.add(task)
+    task.add_done_callback(prewarm_done)
+    return {"queued": len(topics), "count": quiz_key("", request.count)[1]}
+
 @app.get("/")
 def read_root():
     return {"status": "Student Coach Service Running"}
@@ -0,0 +1,48 @@
+import argparse
+import os
+import httpx
+import psycopg2
+from edupath import discovery
+
+# Pre-warm the coach's quiz cache before class sessions (run from cron or by hand):
+#   python prewarm_quizzes.py --url http://student-coach-backend:5000 --count 5
+# Topics come from quizzes.topic and courses.title; the coach generates them in the
+# background, a few at a time, and skips the ones already cached.
+# The quiz cache lives in each coach process, so every healthy replica registered in Consul is
+# warmed; --url is used when Consul knows none.
+
+DB_USER = os.getenv('POSTGRES_USER', 'admin')
+DB_PASS = os.getenv('POSTGRES_PASSWORD', 'adminpassword')
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_PORT = os.getenv('DB_PORT', '5433' if DB_HOST == 'localhost' else '5432')
+DB_NAME = os.getenv('POSTGRES_DB', 'edupath_db')
+
+TOPIC_QUERY = """
+    SELECT DISTINCT topic FROM quizzes WHERE topic IS NOT NULL AND topic <> ''
+    UNION
+    SELECT DISTINCT title FROM courses WHERE title IS NOT NULL AND title <> ''
+"""
+
+def load_topics():
+    conn = psycopg2.connect(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, dbname=DB_NAME)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(TOPIC_QUERY)
+            return sorted(row[0] for row in cur.fetchall())
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate quizzes for every known topic")
+    parser.add_argument("--url", default=os.getenv("STUDENT_COACH_URL", "http://localhost:5000"))
+    parser.add_argument("--count", type=int, default=5, help="questions per quiz")
+    args = parser.parse_args()
+
+    topics = load_topics()
+    print(f"Found {len(topics)} topics in quizzes/courses")
+    instances = discovery.get_registry().instances("student-coach-backend", wait_ready=5.0)
+    urls = [f"http://{address}:{port}" for address, port in instances] or [args.url]
+    for url in urls:
+        resp = httpx.post(f"{url}/quiz/prewarm", json={"topics": topics, "count": args.count}, timeout=30)
+        resp.raise_for_status()
+        print(f"{url}: queued for pre-warm: {resp.json()}")
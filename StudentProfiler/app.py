@@ -1,21 +1,25 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import text
 import os
 from flask_cors import CORS
+from edupath import db, discovery
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# DB Config
-DB_USER = os.getenv('POSTGRES_USER', 'admin')
-DB_PASS = os.getenv('POSTGRES_PASSWORD', 'adminpassword')
-DB_HOST = os.getenv('POSTGRES_HOST', 'postgres') # 'postgres' is the docker service name
-DB_PORT = os.getenv('POSTGRES_PORT', '5432') # Internal port is 5432
-DB_NAME = os.getenv('POSTGRES_DB', 'edupath_db')
-DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+# Request-serving: a runaway query fails fast instead of holding a pooled connection
+engine = db.get_engine(statement_timeout_ms=int(os.getenv('PROFILER_STATEMENT_TIMEOUT_MS', '5000')))
 
-engine = create_engine(DATABASE_URI)
+def parse_id(value):
+    # JSON integers or strings of digits; bools, floats and anything else are rejected
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ValueError(value)
 
 @app.route('/profiles', methods=['GET'])
 def get_profiles():
@@ -35,5 +39,64 @@ def get_student_profile(student_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/profiles/batch', methods=['POST'])
+def get_profiles_batch():
+    # Input: {"student_ids": [1, 2, 3]} or {"class_id": 4}
+    try:
+        data = request.get_json(silent=True) or {}
+        student_ids = data.get('student_ids')
+        class_id = data.get('class_id')
+
+        if student_ids is None and class_id is None:
+            return jsonify({"error": "student_ids or class_id is required"}), 400
+
+        # Validate before touching the database, so bad input is a 400 and not a 500
+        if student_ids is not None:
+            if not isinstance(student_ids, list):
+                return jsonify({"error": "student_ids must be a list"}), 400
+            try:
+                student_ids = [parse_id(s) for s in student_ids]
+            except ValueError:
+                return jsonify({"error": "student_ids must be integers"}), 400
+        else:
+            try:
+                class_id = parse_id(class_id)
+            except ValueError:
+                return jsonify({"error": "class_id must be an integer"}), 400
+
+        if student_ids is not None:
+            # Single round trip for the whole list
+            df = pd.read_sql(
+                text("SELECT * FROM student_profiles WHERE student_id = ANY(:ids)"),
+                engine,
+                params={"ids": student_ids}
+            )
+        else:
+            df = pd.read_sql(
+                text("""
+                    SELECT sp.* FROM student_profiles sp
+                    JOIN students s ON s.id = sp.student_id
+                    WHERE s.class_id = :class_id
+                    ORDER BY sp.student_id
+                """),
+                engine,
+                params={"class_id": class_id}
+            )
+            student_ids = df['student_id'].tolist()
+
+        # Preserve input order and report ids without a profile
+        by_id = {int(r['student_id']): r for r in df.to_dict(orient='records')}
+        profiles = [by_id[s] for s in student_ids if s in by_id]
+        missing = [s for s in student_ids if s not in by_id]
+        return jsonify({"profiles": profiles, "missing": missing})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/health', methods=['GET'])
+def health():
+    # Consul health check
+    return jsonify({"status": "ok"})
+
 if __name__ == '__main__':
+    discovery.register_in_background("student-profiler", 5001, check_path="/health")
     app.run(host='0.0.0.0', port=5001)
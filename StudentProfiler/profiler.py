@@ -1,23 +1,206 @@
 
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import text
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import argparse
+import io
+import time
 import os
+from edupath import db
 
-DB_USER = 'admin'
-DB_PASS = 'adminpassword'
-DB_HOST = os.getenv('DB_HOST', 'postgres')
-DB_PORT = os.getenv('DB_PORT', '5432')
-DB_NAME = 'edupath_db'
-DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+# Model selection config (used by --auto-k)
+K_MIN = int(os.getenv('PROFILER_K_MIN', '2'))
+K_MAX = int(os.getenv('PROFILER_K_MAX', '8'))
+SILHOUETTE_SAMPLE_SIZE = int(os.getenv('PROFILER_SILHOUETTE_SAMPLE', '10000'))
+PROFILER_WORKERS = int(os.getenv('PROFILER_WORKERS', '0')) or None  # None = os.cpu_count()
 
-def run_profiler():
+def stratified_sample(labels, sample_size, seed=42):
+    # Sample proportionally from every cluster so small clusters still get scored
+    n = len(labels)
+    if n <= sample_size:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    picked = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        take = max(2, int(round(sample_size * len(members) / n)))
+        take = min(take, len(members))
+        picked.append(rng.choice(members, size=take, replace=False))
+    return np.sort(np.concatenate(picked))
+
+def evaluate_k(k, X_scaled, sample_size, seed=42):
+    # Runs in a worker process: fit KMeans for one k and score it on a sample
+    start = time.perf_counter()
+    kmeans = KMeans(n_clusters=k, random_state=seed, n_init=10)
+    labels = kmeans.fit_predict(X_scaled)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    idx = stratified_sample(labels, sample_size, seed)
+    if len(np.unique(labels[idx])) < 2:
+        score = -1.0
+    else:
+        score = float(silhouette_score(X_scaled[idx], labels[idx]))
+    score_seconds = time.perf_counter() - start
+
+    return {
+        "k": k,
+        "silhouette": score,
+        "inertia": float(kmeans.inertia_),
+        "fit_seconds": fit_seconds,
+        "score_seconds": score_seconds,
+        "sample_size": int(len(idx)),
+        "labels": labels,
+    }
+
+def select_k(X_scaled, k_min=K_MIN, k_max=K_MAX, sample_size=SILHOUETTE_SAMPLE_SIZE, workers=PROFILER_WORKERS):
+    # Evaluate every candidate k in parallel and keep the best silhouette
+    k_max = min(k_max, len(X_scaled) - 1)
+    candidates = list(range(max(2, k_min), k_max + 1))
+    if not candidates:
+        raise ValueError("Not enough students to evaluate a range of k")
+
+    print(f"Evaluating k in {candidates[0]}..{candidates[-1]} (silhouette sample={sample_size})...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_k, k, X_scaled, sample_size) for k in candidates]
+        results = [f.result() for f in futures]
+
+    for r in results:
+        print(f"  k={r['k']}: silhouette={r['silhouette']:.4f} fit={r['fit_seconds']:.2f}s score={r['score_seconds']:.2f}s")
+
+    best = max(results, key=lambda r: r['silhouette'])
+    return best, results
+
+def renumber_clusters(df):
+    # KMeans numbers clusters arbitrarily from run to run; renumber them 0..k-1 by ascending mean
+    # score (ties broken by activity) so an unchanged grouping keeps its cluster_label and the
+    # diff-based write-back leaves those students alone
+    stats = df.groupby('cluster_label')[['avg_score', 'total_actions', 'total_time']].mean()
+    order = stats.sort_values(['avg_score', 'total_actions', 'total_time'], kind='stable').index
+    df['cluster_label'] = df['cluster_label'].map({cluster: rank for rank, cluster in enumerate(order)})
+    return df
+
+def label_clusters(df):
+    # Map cluster centers to semantic names; expects the ranked labels from renumber_clusters.
+    # Lowest = At Risk, highest = High Achiever, everything in between = Standard (k=3 gives the
+    # original one-to-one mapping). With k > 3 the middle clusters are Standard 1..k-2, lowest
+    # score first, so a larger k chosen by --auto-k stays visible in profile_type
+    k = df['cluster_label'].nunique()
+    names = {}
+    for rank in range(k):
+        if rank == 0:
+            names[rank] = 'At Risk'
+        elif rank == k - 1:
+            names[rank] = 'High Achiever'
+        elif k == 3:
+            names[rank] = 'Standard'
+        else:
+            names[rank] = f'Standard {rank}'
+    df['profile_type'] = df['cluster_label'].map(names).fillna('Unknown')
+    return df
+
+def save_selection_report(engine, best, results, n_students):
+    # Persist per-k scores next to student_profiles so a run can be audited
+    run_at = datetime.now(timezone.utc)
+    report = pd.DataFrame([{
+        "run_at": run_at,
+        "k": r['k'],
+        "silhouette": r['silhouette'],
+        "inertia": r['inertia'],
+        "fit_seconds": r['fit_seconds'],
+        "score_seconds": r['score_seconds'],
+        "sample_size": r['sample_size'],
+        "n_students": n_students,
+        "chosen": r['k'] == best['k'],
+    } for r in results])
+    report.to_sql('student_profile_runs', engine, if_exists='append', index=False)
+    print(f"Saved k-selection report to 'student_profile_runs' (chosen k={best['k']}).")
+
+def write_profiles(engine, df):
+    # Diff-based write-back: only rows whose cluster/profile changed are touched.
+    # Rows are COPY'd into a temp table, then upserted with ON CONFLICT DO UPDATE
+    # guarded by IS DISTINCT FROM so unchanged students generate no row versions.
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS student_profiles (
+              student_id INTEGER PRIMARY KEY,
+              email VARCHAR(100),
+              cluster_label INTEGER,
+              profile_type VARCHAR(50)
+            );
+        """))
+        # Tables created by older replace-style runs have no key; ON CONFLICT needs one
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS student_profiles_student_id_uidx ON student_profiles (student_id)"))
+
+    buf = io.StringIO()
+    df[['student_id', 'email', 'cluster_label', 'profile_type']].to_csv(buf, index=False, header=False)
+    buf.seek(0)
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("""
+            CREATE TEMP TABLE student_profiles_stage (
+              student_id INTEGER,
+              email VARCHAR(100),
+              cluster_label INTEGER,
+              profile_type VARCHAR(50)
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert("COPY student_profiles_stage FROM STDIN WITH (FORMAT csv)", buf)
+
+        cur.execute("""
+            INSERT INTO student_profiles (student_id, email, cluster_label, profile_type)
+            SELECT student_id, email, cluster_label, profile_type FROM student_profiles_stage
+            ON CONFLICT (student_id) DO UPDATE
+               SET email = EXCLUDED.email,
+                   cluster_label = EXCLUDED.cluster_label,
+                   profile_type = EXCLUDED.profile_type
+             WHERE student_profiles.cluster_label IS DISTINCT FROM EXCLUDED.cluster_label
+                OR student_profiles.profile_type IS DISTINCT FROM EXCLUDED.profile_type
+                OR student_profiles.email IS DISTINCT FROM EXCLUDED.email
+            RETURNING student_id, (xmax = 0) AS inserted
+        """)
+        upserted = cur.fetchall()
+
+        # Students no longer in analytics (replace semantics used to drop them)
+        cur.execute("""
+            DELETE FROM student_profiles sp
+             WHERE NOT EXISTS (SELECT 1 FROM student_profiles_stage s WHERE s.student_id = sp.student_id)
+            RETURNING student_id
+        """)
+        deleted = [row[0] for row in cur.fetchall()]
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    inserted = [row[0] for row in upserted if row[1]]
+    updated = [row[0] for row in upserted if not row[1]]
+    summary = {
+        "total": len(df),
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+        "changed_ids": sorted(inserted + updated + deleted),
+    }
+    print(f"student_profiles: {len(inserted)} inserted, {len(updated)} updated, "
+          f"{len(deleted)} deleted, {len(df) - len(inserted) - len(updated)} unchanged.")
+    return summary
+
+def run_profiler(auto_k=False, k=3, k_min=K_MIN, k_max=K_MAX, sample_size=SILHOUETTE_SAMPLE_SIZE, workers=PROFILER_WORKERS):
     print("Starting Student Profiler...")
-    engine = create_engine(DATABASE_URI)
+    engine = db.get_engine()
 
     # 1. Load Analytic Data
-    df = pd.read_sql("SELECT * FROM student_analytics", engine)
+    df = db.fetch_frame("SELECT * FROM student_analytics")
     
     if df.empty:
         print("No analytics data found.")
@@ -31,37 +214,42 @@ def run_profiler():
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
-    # 3. Cluster (K=3: Struggling, Average, High Performing)
-    print("Running KMeans (k=3)...")
-    kmeans = KMeans(n_clusters=3, random_state=42)
-    clusters = kmeans.fit_predict(X_scaled)
+    # 3. Cluster (default K=3: Struggling, Average, High Performing)
+    if auto_k:
+        best, results = select_k(X_scaled, k_min, k_max, sample_size, workers)
+        clusters = best['labels']
+        k = best['k']
+    else:
+        print(f"Running KMeans (k={k})...")
+        kmeans = KMeans(n_clusters=k, random_state=42)
+        clusters = kmeans.fit_predict(X_scaled)
     
     # 4. Save results back
     df['cluster_label'] = clusters
-    
-    # Map cluster centers to semantic names
-    # Heuristic: Compare mean score of clusters
-    df['profile_type'] = 'Unknown'
-    
-    cluster_stats = df.groupby('cluster_label')['avg_score'].mean()
-    sorted_clusters = cluster_stats.sort_values() # Ascending: 0=Lowest, 2=Highest
-    
-    risk_cluster = sorted_clusters.index[0]
-    avg_cluster = sorted_clusters.index[1]
-    high_cluster = sorted_clusters.index[2]
-    
-    df.loc[df['cluster_label'] == risk_cluster, 'profile_type'] = 'At Risk'
-    df.loc[df['cluster_label'] == avg_cluster, 'profile_type'] = 'Standard'
-    df.loc[df['cluster_label'] == high_cluster, 'profile_type'] = 'High Achiever'
+    df = renumber_clusters(df)
+    df = label_clusters(df)
 
     print("Profiles assigned:")
     print(df['profile_type'].value_counts())
 
-    # Save to DB (Update or separate table? Let's write to student_profiles)
+    # Save to DB: upsert only the students whose assignment changed
     print("Saving to 'student_profiles' table...")
-    df[['student_id', 'email', 'cluster_label', 'profile_type']].to_sql('student_profiles', engine, if_exists='replace', index=False)
+    changes = write_profiles(engine, df)
+
+    if auto_k:
+        save_selection_report(engine, best, results, len(df))
     
     print("Profiling Complete.")
+    return changes
 
 if __name__ == "__main__":
-    run_profiler()
+    parser = argparse.ArgumentParser(description="EduPath Student Profiler")
+    parser.add_argument('--auto-k', action='store_true', help="Pick k by parallel sampled silhouette scoring")
+    parser.add_argument('--k', type=int, default=3, help="Fixed number of clusters (ignored with --auto-k)")
+    parser.add_argument('--k-min', type=int, default=K_MIN)
+    parser.add_argument('--k-max', type=int, default=K_MAX)
+    parser.add_argument('--sample-size', type=int, default=SILHOUETTE_SAMPLE_SIZE)
+    parser.add_argument('--workers', type=int, default=PROFILER_WORKERS)
+    args = parser.parse_args()
+    run_profiler(auto_k=args.auto_k, k=args.k, k_min=args.k_min, k_max=args.k_max,
+                 sample_size=args.sample_size, workers=args.workers)
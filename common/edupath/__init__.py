@@ -0,0 +1,3 @@
+# Shared building blocks for the EduPath Python services.
+# Install into a service image with:  pip install "/opt/edupath[discovery]"   (extras: discovery, events, db)
+# Local development:                   pip install -e "common[discovery,db]"
@@ -0,0 +1,186 @@
+import io
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+# Postgres access shared by the Python services and batch jobs.
+# - get_engine(): one pooled SQLAlchemy engine (psycopg2) per process and configuration, with
+#   pre-ping, connection recycling and an optional statement_timeout, instead of a fresh
+#   create_engine() with default pooling on every call.
+# - connection(): a pooled raw psycopg2 connection, for COPY and cursor-level work.
+# - iter_rows() / iter_frames(): server-side (named) cursors, so big tables stream in chunks
+#   instead of being pulled into client memory in one go.
+# - fetch_frame(): query -> DataFrame (or Arrow table) through COPY ... TO STDOUT, typed from the
+#   query's result description.
+# Settings come from the env vars the services already use (POSTGRES_*, DB_HOST, DB_PORT).
+
+DB_USER = os.getenv("POSTGRES_USER", "admin")
+DB_PASS = os.getenv("POSTGRES_PASSWORD", "adminpassword")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+# Outside docker the compose postgres is published on 5433; inside the network it listens on 5432
+DB_PORT = int(os.getenv("DB_PORT", "5433" if DB_HOST == "localhost" else "5432"))
+DB_NAME = os.getenv("POSTGRES_DB", "edupath_db")
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))          # seconds to wait for a free connection
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))          # seconds before a connection is replaced
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = no limit (batch jobs)
+ITERSIZE = int(os.getenv("DB_ITERSIZE", "10000"))                 # rows per server-side cursor fetch
+APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "edupath")
+
+# Postgres type OIDs that fetch_frame decodes; everything else (json, arrays, uuid, ...) stays text
+INT_OIDS = {20, 21, 23, 26}          # int8, int2, int4, oid
+FLOAT_OIDS = {700, 701, 1700}        # float4, float8, numeric
+BOOL_OID = 16
+DATE_OID = 1082
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+
+# fetch_frame's COPY writes NULL as an unquoted \N, so an empty string ("" or an empty field)
+# stays an empty string in both parsers; a real "\N" value is quoted by COPY
+COPY_NULL = "\\N"
+
+def database_url():
+    # Unix-socket directories go in the query string, host names in the authority part
+    if DB_HOST.startswith("/"):
+        return URL.create("postgresql+psycopg2", username=DB_USER, password=DB_PASS, database=DB_NAME,
+                          query={"host": DB_HOST, "port": str(DB_PORT)})
+    return URL.create("postgresql+psycopg2", username=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT,
+                      database=DB_NAME)
+
+engines = {}
+engines_lock = threading.Lock()
+
+def get_engine(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, statement_timeout_ms=STATEMENT_TIMEOUT_MS,
+               application_name=APPLICATION_NAME):
+    key = (pool_size, max_overflow, statement_timeout_ms, application_name)
+    with engines_lock:
+        engine = engines.get(key)
+        if engine is None:
+            connect_args = {"application_name": application_name}
+            if statement_timeout_ms:
+                connect_args["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+            engine = create_engine(
+                database_url(),
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=POOL_TIMEOUT,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=True,       # a connection dropped by a DB restart is replaced, not handed out
+                connect_args=connect_args,
+            )
+            engines[key] = engine
+        return engine
+
+@contextmanager
+def connection(engine=None):
+    # Raw psycopg2 connection from the pool; anything left uncommitted is rolled back on return
+    raw = (engine or get_engine()).raw_connection()
+    try:
+        yield raw
+    finally:
+        raw.close()
+
+cursor_ids = itertools.count()
+
+def iter_rows(query, params=None, itersize=ITERSIZE, engine=None):
+    # Rows of a large result, fetched itersize at a time from a server-side cursor
+    with connection(engine) as conn:
+        with conn.cursor(name=f"edupath_cursor_{next(cursor_ids)}") as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            yield from cur
+
+def iter_frames(query, params=None, chunksize=ITERSIZE, engine=None):
+    # Same as iter_rows, as DataFrames of up to chunksize rows
+    with connection(engine) as conn:
+        with conn.cursor(name=f"edupath_cursor_{next(cursor_ids)}") as cur:
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows:
+                    return
+                yield pd.DataFrame.from_records(rows, columns=[d[0] for d in cur.description])
+
+def arrow_type(oid):
+    if oid in INT_OIDS:
+        return pa.int64()
+    if oid in FLOAT_OIDS:
+        return pa.float64()
+    if oid == BOOL_OID:
+        return pa.bool_()
+    if oid == DATE_OID:
+        return pa.date32()
+    if oid == TIMESTAMP_OID:
+        return pa.timestamp("us")
+    if oid == TIMESTAMPTZ_OID:
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+def parse_arrow(buf, columns):
+    schema = pa.schema([(name, arrow_type(oid)) for name, oid in columns])
+    if not buf.getbuffer().nbytes:
+        return schema.empty_table()
+    return pa_csv.read_csv(
+        buf,
+        read_options=pa_csv.ReadOptions(column_names=schema.names),
+        # COPY quotes values with embedded newlines; without this the chunker splits inside them
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=dict(zip(schema.names, schema.types)),
+            true_values=["t"], false_values=["f"],
+            null_values=[COPY_NULL], strings_can_be_null=True, quoted_strings_can_be_null=False,
+        ),
+    )
+
+def parse_pandas(buf, columns):
+    names = [name for name, _ in columns]
+    if not buf.getbuffer().nbytes:
+        return pd.DataFrame(columns=names)
+    numeric = INT_OIDS | FLOAT_OIDS
+    df = pd.read_csv(
+        buf, header=None, names=names, keep_default_na=False, na_values=[COPY_NULL],
+        dtype={name: object for name, oid in columns if oid not in numeric},
+    )
+    for name, oid in columns:
+        if oid == BOOL_OID:
+            df[name] = df[name].map({"t": True, "f": False})
+        elif oid in (TIMESTAMP_OID, TIMESTAMPTZ_OID):
+            df[name] = pd.to_datetime(df[name], utc=oid == TIMESTAMPTZ_OID)
+        elif oid == DATE_OID:
+            df[name] = pd.to_datetime(df[name]).dt.date
+    return df
+
+def fetch_frame(query, params=None, engine=None, arrow=False):
+    # SELECT -> DataFrame through COPY, much cheaper than read_sql's row-by-row conversion on big
+    # results. params use psycopg2 style (%(name)s). arrow=True returns the pyarrow Table.
+    if arrow and not HAS_ARROW:
+        raise ImportError("fetch_frame(arrow=True) needs pyarrow")
+    with connection(engine) as conn:
+        with conn.cursor() as cur:
+            if params is not None:
+                query = cur.mogrify(query, params).decode()
+            # Column names and types without running the query
+            cur.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+            columns = [(d[0], d[1]) for d in cur.description]
+            buf = io.BytesIO()
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, NULL '{COPY_NULL}')", buf)
+        conn.rollback()
+    buf.seek(0)
+    if not HAS_ARROW:
+        return parse_pandas(buf, columns)
+    table = parse_arrow(buf, columns)
+    return table if arrow else table.to_pandas()
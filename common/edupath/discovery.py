@@ -0,0 +1,228 @@
+import atexit
+import itertools
+import os
+import socket
+import threading
+
+import httpx
+
+try:
+    import consul
+    HAS_CONSUL = True
+except ImportError:
+    HAS_CONSUL = False
+
+# Service discovery through Consul, shared by the Python services.
+# - register_in_background(): registers this instance (with an HTTP health check) from a daemon
+#   thread, retrying with backoff, so a slow or missing Consul never delays startup.
+# - ServiceRegistry: locally cached list of healthy instances per service, kept current by Consul
+#   blocking queries (a "watch"); lookups never touch the network.
+# - ServiceClient: round-robin over those instances with pooled keep-alive connections (sync and
+#   async), falling back to a static URL (compose DNS name / env) when Consul has nothing.
+
+CONSUL_HOST = os.getenv("CONSUL_HOST", "consul")
+CONSUL_PORT = int(os.getenv("CONSUL_PORT", "8500"))
+DISCOVERY_ENABLED = os.getenv("DISCOVERY_ENABLED", "1") != "0"
+WATCH_WAIT = int(os.getenv("CONSUL_WATCH_WAIT", "30"))        # seconds a blocking query may hang
+MAX_BACKOFF = 30.0
+
+def consul_client(timeout=10):
+    return consul.Consul(host=CONSUL_HOST, port=CONSUL_PORT, timeout=timeout)
+
+def local_address():
+    # What other containers should dial: SERVICE_ADDRESS if set, else this container's IP
+    address = os.getenv("SERVICE_ADDRESS")
+    if address:
+        return address
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except OSError:
+        return socket.gethostname()
+
+def register_in_background(name, port, check_path="/", address=None, interval="10s", timeout="5s",
+                           deregister_after="1m"):
+    # Returns the registration thread (None when discovery is off); the caller never waits on it
+    if not (DISCOVERY_ENABLED and HAS_CONSUL):
+        print(f"Consul registration skipped for {name} (discovery disabled or python-consul2 missing)")
+        return None
+    address = address or local_address()
+    # One id per replica, so scaled-out instances do not overwrite each other
+    service_id = f"{name}-{socket.gethostname()}-{port}"
+
+    def register():
+        backoff = 1.0
+        while True:
+            try:
+                c = consul_client()
+                c.agent.service.register(
+                    name=name,
+                    service_id=service_id,
+                    address=address,
+                    port=port,
+                    check=consul.Check.http(f"http://{address}:{port}{check_path}", interval,
+                                            timeout=timeout, deregister=deregister_after),
+                )
+                atexit.register(deregister, service_id)
+                print(f"Registered with Consul as {service_id} ({address}:{port})")
+                return
+            except Exception as e:
+                print(f"Consul registration failed ({e}); retrying in {backoff:.0f}s")
+                threading.Event().wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    thread = threading.Thread(target=register, name=f"consul-register-{name}", daemon=True)
+    thread.start()
+    return thread
+
+def deregister(service_id):
+    try:
+        consul_client(timeout=2).agent.service.deregister(service_id)
+    except Exception:
+        pass
+
+class ServiceRegistry:
+    def __init__(self, wait=WATCH_WAIT):
+        self.wait = wait
+        self._instances = {}   # service -> [(address, port)], replaced wholesale on every change
+        self._ready = {}       # service -> Event set after the first answer (or failure)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def watch(self, service):
+        with self._lock:
+            if service in self._ready:
+                return
+            self._ready[service] = threading.Event()
+        if not (DISCOVERY_ENABLED and HAS_CONSUL):
+            self._ready[service].set()
+            return
+        threading.Thread(target=self._watch_loop, args=(service,), name=f"consul-watch-{service}",
+                         daemon=True).start()
+
+    def instances(self, service, wait_ready=0.0):
+        # Cached healthy instances; wait_ready lets the very first lookup wait for the first answer
+        self.watch(service)
+        if wait_ready:
+            self._ready[service].wait(wait_ready)
+        return self._instances.get(service, [])
+
+    def _watch_loop(self, service):
+        c = consul_client(timeout=self.wait + 10)
+        index = None
+        backoff = 1.0
+        failing = False
+        while not self._stop.is_set():
+            try:
+                new_index, nodes = c.health.service(service, passing=True, index=index, wait=f"{self.wait}s")
+                # Consul asks clients to restart the watch when the index goes backwards
+                index = new_index if index is None or int(new_index) >= int(index) else None
+                instances = sorted(
+                    (n["Service"]["Address"] or n["Node"]["Address"], n["Service"]["Port"]) for n in nodes
+                )
+                if instances != self._instances.get(service):
+                    print(f"Discovery: {service} -> {len(instances)} healthy instance(s)")
+                self._instances[service] = instances
+                self._ready[service].set()
+                backoff = 1.0
+                failing = False
+            except Exception as e:
+                if not failing:
+                    print(f"Consul watch for {service} failed ({e}); keeping {len(self._instances.get(service, []))} cached instance(s)")
+                failing = True
+                index = None
+                # Callers blocked on the first lookup go to the fallback URL instead of waiting
+                self._ready[service].set()
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def stop(self):
+        self._stop.set()
+
+registry = None
+registry_lock = threading.Lock()
+
+def get_registry():
+    global registry
+    with registry_lock:
+        if registry is None:
+            registry = ServiceRegistry()
+        return registry
+
+class ServiceClient:
+    # Calls to one logical service, spread round-robin over its healthy instances.
+    # A request that cannot even connect is retried on the next instance (safe for POSTs too,
+    # nothing reached the server); slow or failing responses are not retried.
+    def __init__(self, service, fallback_url=None, registry=None, timeout=5.0, max_connections=100,
+                 max_keepalive=20, retries=1):
+        self.service = service
+        self.fallback_url = fallback_url.rstrip("/") if fallback_url else None
+        self.registry = registry or get_registry()
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.retries = retries
+        self.requests = {}
+        self.connect_errors = 0
+        self._rr = itertools.count()
+        self._client = None
+        self._async_client = None
+        self.registry.watch(service)
+
+    def urls(self, wait_ready=1.0):
+        instances = self.registry.instances(self.service, wait_ready=wait_ready)
+        if instances:
+            return [f"http://{address}:{port}" for address, port in instances]
+        return [self.fallback_url] if self.fallback_url else []
+
+    def _candidates(self, wait_ready=1.0):
+        urls = self.urls(wait_ready)
+        if not urls:
+            raise LookupError(f"No healthy instances of {self.service} and no fallback URL")
+        start = next(self._rr) % len(urls)
+        ordered = urls[start:] + urls[:start]
+        return ordered[:self.retries + 1]
+
+    def _count(self, base):
+        self.requests[base] = self.requests.get(base, 0) + 1
+
+    def request(self, method, path, **kwargs):
+        if self._client is None:
+            self._client = httpx.Client(limits=self.limits, timeout=self.timeout)
+        candidates = self._candidates()
+        for i, base in enumerate(candidates):
+            try:
+                self._count(base)
+                return self._client.request(method, base + path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                self.connect_errors += 1
+                if i == len(candidates) - 1:
+                    raise
+
+    async def arequest(self, method, path, **kwargs):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        # Never block the event loop on the first Consul answer; the fallback URL covers that window
+        candidates = self._candidates(wait_ready=0.0)
+        for i, base in enumerate(candidates):
+            try:
+                self._count(base)
+                return await self._async_client.request(method, base + path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                self.connect_errors += 1
+                if i == len(candidates) - 1:
+                    raise
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+
+    def stats(self):
+        return {
+            "service": self.service,
+            "instances": self.urls(wait_ready=0.0),
+            "requests": dict(self.requests),
+            "connect_errors": self.connect_errors,
+        }
@@ -0,0 +1,55 @@
+import io
+
+import pandas as pd
+import pytest
+
+from edupath import db
+
+# Result description as fetch_frame sees it: (name, type OID)
+COLUMNS = [("id", 23), ("description", 25), ("active", 16)]
+
+def copy_buffer(rows=60000):
+    # What COPY ... WITH (FORMAT csv, NULL '\N') writes: multi-line values quoted, the empty string
+    # as "", NULL as an unquoted \N
+    lines = []
+    for i in range(rows):
+        if i % 11 == 0:
+            lines.append(f"{i},{db.COPY_NULL},{db.COPY_NULL}")
+        elif i % 7 == 0:
+            lines.append(f'{i},"",f')
+        else:
+            lines.append(f'{i},"desc {i}\nsecond line, with ""quotes""",t')
+    buf = io.BytesIO(("\n".join(lines) + "\n").encode())
+    assert buf.getbuffer().nbytes > 1 << 20   # bigger than one pyarrow block
+    return buf
+
+def check(df, rows=60000):
+    assert len(df) == rows
+    assert df["id"].tolist() == list(range(rows))
+    assert df.loc[1, "description"] == 'desc 1\nsecond line, with "quotes"'
+    assert bool(df.loc[1, "active"]) is True
+    assert df.loc[7, "description"] == ""
+    assert bool(df.loc[7, "active"]) is False
+    assert pd.isna(df.loc[11, "description"]) and pd.isna(df.loc[11, "active"])
+    assert df["description"].isna().sum() == len(range(0, rows, 11))
+
+@pytest.mark.skipif(not db.HAS_ARROW, reason="pyarrow not installed")
+def test_parse_arrow_multiline_over_one_block():
+    check(db.parse_arrow(copy_buffer(), COLUMNS).to_pandas())
+
+def test_parse_pandas_multiline_over_one_block():
+    check(db.parse_pandas(copy_buffer(), COLUMNS))
+
+def test_fetch_frame_round_trip():
+    try:
+        with db.connection() as conn:
+            conn.cursor().execute("SELECT 1")
+    except Exception as e:
+        pytest.skip(f"no database: {e}")
+    query = """
+        SELECT g AS id,
+               CASE WHEN g % 11 = 0 THEN NULL WHEN g % 7 = 0 THEN '' ELSE 'desc ' || g || E'\\nsecond line, with "quotes"' END AS description,
+               CASE WHEN g % 11 = 0 THEN NULL ELSE g % 7 <> 0 END AS active
+        FROM generate_series(0, 59999) g ORDER BY g
+    """
+    check(db.fetch_frame(query))
@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from sqlalchemy import text
+
+from edupath import db
+
+# Incremental batch pipeline:
+#   etl (PrepaData) -> profiler (StudentProfiler)
+#                   -> predictor training (PathPredictor)
+#   recommendation index build (RecoBuilder), alongside them: it only reads resources
+# Usage:
+#   python run_pipeline.py                  run whatever changed
+#   python run_pipeline.py --dry-run        show what would run, and why
+#   python run_pipeline.py --force etl      rerun etl (downstream stages run if its output changed)
+# Every stage runs as its own process in its service directory; independent stages run in parallel.
+# Right before a stage would start (so after its upstream stages finished) its inputs are
+# fingerprinted: watermarks of the tables it reads, hashes of the files it reads, its code and the
+# env settings it depends on. A stage whose fingerprint matches its last successful run, and whose
+# outputs still exist, is skipped. Fingerprints are kept in PIPELINE_STATE.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.getenv('PIPELINE_STATE', os.path.join(ROOT, 'pipeline_state.json'))
+SHARED_CODE = ['common/edupath/db.py']
+
+# Cheap change detectors per table; a table that does not exist fingerprints as "missing"
+WATERMARKS = {
+    # Append-only activity log
+    'student_logs': "SELECT count(*), max(log_id) FROM student_logs",
+    # The ETL only reads id and email
+    'students': "SELECT count(*), md5(string_agg(id || ',' || coalesce(email, ''), '|' ORDER BY id)) FROM students",
+    # Rewritten wholesale by every ETL run: compare contents, so an identical rewrite does not cascade
+    'student_analytics': "SELECT count(*), md5(string_agg(t::text, '|' ORDER BY t::text)) FROM student_analytics t",
+    # updated_at is kept current by a trigger (see recommender.init_resources)
+    'resources': "SELECT count(*), max(resource_id), max(updated_at) FROM resources",
+}
+
+STAGES = {
+    'etl': {
+        'cwd': 'PrepaData',
+        'command': ['etl.py'],
+        'deps': [],
+        'tables': ['student_logs', 'students'],
+        'files': ['PrepaData/external_data.csv'],
+        'code': ['PrepaData/etl.py'],
+        'env': [],
+        'output_tables': ['student_analytics'],
+        'output_files': [],
+    },
+    'profiler': {
+        'cwd': 'StudentProfiler',
+        'command': ['profiler.py'],
+        'deps': ['etl'],
+        'tables': ['student_analytics'],
+        'files': [],
+        'code': ['StudentProfiler/profiler.py'],
+        'env': ['PROFILER_'],
+        'output_tables': ['student_profiles'],
+        'output_files': [],
+    },
+    'predictor': {
+        'cwd': 'PathPredictor',
+        'command': ['predictor.py'],
+        'deps': ['etl'],
+        'tables': ['student_analytics'],
+        'files': [],
+        'code': ['PathPredictor/predictor.py'],
+        'env': [],
+        'output_tables': [],
+        'output_files': ['PathPredictor/model.pkl'],
+    },
+    'reco_index': {
+        'cwd': 'RecoBuilder',
+        'command': ['recommender.py'],
+        'deps': [],
+        'tables': ['resources'],
+        'files': [],
+        'code': ['RecoBuilder/recommender.py', 'RecoBuilder/encoder.py', 'RecoBuilder/embedding_store.py'],
+        'env': ['INDEX_', 'EMBEDDING_MODEL', 'ENCODER_BACKEND', 'ENCODER_ONNX'],
+        'output_tables': [],
+        'output_files': [os.path.join('RecoBuilder', os.getenv('INDEX_PATH', 'faiss_index.bin')),
+                         os.path.join('RecoBuilder', os.getenv('INDEX_META_PATH', 'resources.parquet'))],
+    },
+}
+
+state_lock = threading.Lock()
+print_lock = threading.Lock()
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH) as f:
+        return json.load(f)
+
+def save_state(state):
+    # Write to a temp file and rename, so an interrupted run never leaves a truncated state file
+    tmp = STATE_PATH + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+def file_hash(path):
+    full = os.path.join(ROOT, path)
+    if not os.path.exists(full):
+        return 'missing'
+    digest = hashlib.sha256()
+    with open(full, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def table_watermark(engine, table):
+    try:
+        with engine.connect() as conn:
+            return [str(v) for v in conn.execute(text(WATERMARKS[table])).one()]
+    except Exception as e:
+        if 'does not exist' in str(e):
+            return 'missing'
+        raise
+
+def table_exists(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT to_regclass(:t)"), {"t": table}).scalar() is not None
+
+def fingerprint(name, args):
+    stage = STAGES[name]
+    engine = db.get_engine()
+    code = hashlib.sha256()
+    for path in stage['code'] + SHARED_CODE:
+        code.update(f"{path}:{file_hash(path)}\n".encode())
+    return {
+        'tables': {t: table_watermark(engine, t) for t in stage['tables']},
+        'files': {path: file_hash(path) for path in stage['files']},
+        'code': code.hexdigest(),
+        'env': {k: v for k, v in sorted(os.environ.items()) if k.startswith(tuple(stage['env']))} if stage['env'] else {},
+        'args': list(args),
+    }
+
+def changed_parts(old, new):
+    parts = []
+    for key in new:
+        if isinstance(new[key], dict):
+            parts += [f"{key}.{k}" for k in sorted(set(new[key]) | set(old.get(key) or {}))
+                      if (old.get(key) or {}).get(k) != new[key].get(k)]
+        elif old.get(key) != new[key]:
+            parts.append(key)
+    return parts
+
+def run_reason(name, components, last, forced):
+    # None means up to date
+    stage = STAGES[name]
+    if forced:
+        return 'forced'
+    if last is None:
+        return 'no previous successful run'
+    engine = db.get_engine()
+    missing = [t for t in stage['output_tables'] if not table_exists(engine, t)]
+    missing += [p for p in stage['output_files'] if not os.path.exists(os.path.join(ROOT, p))]
+    if missing:
+        return f"missing output: {', '.join(missing)}"
+    parts = changed_parts(last['components'], components)
+    return f"changed: {', '.join(parts)}" if parts else None
+
+def run_command(name, args):
+    stage = STAGES[name]
+    proc = subprocess.Popen(
+        [sys.executable] + stage['command'] + list(args),
+        cwd=os.path.join(ROOT, stage['cwd']),
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        env={**os.environ, 'PYTHONUNBUFFERED': '1'},
+    )
+    # Stages run in parallel: prefix every line with the stage name
+    for line in proc.stdout:
+        with print_lock:
+            print(f"[{name}] {line.rstrip()}", flush=True)
+    return proc.wait()
+
+def process_stage(name, state, forced, dry_run, args):
+    start = time.perf_counter()
+    components = fingerprint(name, args)
+    digest = hashlib.sha256(json.dumps(components, sort_keys=True).encode()).hexdigest()
+    with state_lock:
+        last = state.get(name)
+    reason = run_reason(name, components, last, forced)
+    fingerprint_seconds = time.perf_counter() - start
+    result = {'fingerprint': digest[:12], 'fingerprint_seconds': round(fingerprint_seconds, 3), 'seconds': 0.0}
+    if reason is None:
+        return {**result, 'status': 'skipped', 'reason': 'up to date'}
+    if dry_run:
+        return {**result, 'status': 'would run', 'reason': reason}
+
+    with print_lock:
+        print(f"[{name}] running ({reason})", flush=True)
+    start = time.perf_counter()
+    code = run_command(name, args)
+    seconds = time.perf_counter() - start
+    result['seconds'] = round(seconds, 2)
+    if code != 0:
+        return {**result, 'status': 'failed', 'reason': f"exit code {code}"}
+    with state_lock:
+        state[name] = {'fingerprint': digest, 'components': components, 'seconds': round(seconds, 2),
+                       'finished_at': datetime.now().isoformat(timespec='seconds')}
+        save_state(state)
+    return {**result, 'status': 'ran', 'reason': reason}
+
+def run_pipeline(force=(), dry_run=False, workers=None, stage_args=None):
+    stage_args = stage_args or {}
+    state = load_state()
+    results = {}
+    pending = list(STAGES)
+    running = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or len(STAGES)) as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = STAGES[name]['deps']
+                if not all(d in results for d in deps):
+                    continue
+                pending.remove(name)
+                upstream = [results[d]['status'] for d in deps]
+                if any(s in ('failed', 'blocked') for s in upstream):
+                    results[name] = {'status': 'blocked', 'reason': 'upstream failed', 'seconds': 0.0}
+                elif dry_run and 'would run' in upstream:
+                    # Whether it really runs depends on what the upstream run writes
+                    results[name] = {'status': 'would run', 'reason': 'upstream will run', 'seconds': 0.0}
+                else:
+                    future = pool.submit(process_stage, name, state, name in force, dry_run,
+                                         stage_args.get(name, []))
+                    running[future] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = {'status': 'failed', 'reason': f"fingerprint error: {e}", 'seconds': 0.0}
+    wall = time.perf_counter() - start
+    return {name: results[name] for name in STAGES}, wall
+
+def print_report(results, wall):
+    print()
+    print(f"{'stage':<12} {'status':<10} {'seconds':>8} {'fp (s)':>7}  reason")
+    for name, r in results.items():
+        fp = f"{r['fingerprint_seconds']:.2f}" if 'fingerprint_seconds' in r else '-'
+        print(f"{name:<12} {r['status']:<10} {r['seconds']:>8.2f} {fp:>7}  {r['reason']}")
+    busy = sum(r['seconds'] for r in results.values())
+    print(f"wall time {wall:.2f}s, stage time {busy:.2f}s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the batch pipeline, skipping stages whose inputs did not change")
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE',
+                        help=f"rerun these stages regardless of fingerprints ({', '.join(STAGES)} or all)")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would run")
+    parser.add_argument('--workers', type=int, default=None, help="max stages running at once")
+    parser.add_argument('--profiler-args', default='', help="extra arguments for profiler.py, e.g. '--auto-k'")
+    parser.add_argument('--report', help="write the per-stage report as JSON")
+    args = parser.parse_args()
+
+    force = set(STAGES) if 'all' in args.force else set(args.force)
+    unknown = force - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    results, wall = run_pipeline(force=force, dry_run=args.dry_run, workers=args.workers,
+                                 stage_args={'profiler': args.profiler_args.split()})
+    print_report(results, wall)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'wall_seconds': round(wall, 2), 'stages': results}, f, indent=2)
+    sys.exit(1 if any(r['status'] in ('failed', 'blocked') for r in results.values()) else 0)
@@ -1,4 +1,3 @@
-import os
 import random
 import time
 from datetime import datetime, timedelta
@@ -20,27 +19,12 @@ except ImportError:
 import psycopg2
 from psycopg2 import sql
 
-from sqlalchemy import create_engine
-
-# DB Config (Environment variables or default for Docker internal)
-DB_USER = os.getenv('POSTGRES_USER', 'admin')
-DB_PASS = os.getenv('POSTGRES_PASSWORD', 'adminpassword')
-DB_HOST = os.getenv('DB_HOST', 'localhost') 
-
-# Logic to handle local execution vs docker
-if DB_HOST == 'localhost':
-    # DB_HOST = '127.0.0.1' 
-    DB_PORT = os.getenv('DB_PORT', '5433') 
-else:
-    DB_PORT = os.getenv('DB_PORT', '5432') 
-
-DB_NAME = os.getenv('POSTGRES_DB', 'edupath_db')
-DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+# DB settings (POSTGRES_*, DB_HOST, DB_PORT) are read by the shared edupath.db module
+from edupath import db
 
 def get_db_connection():
     try:
-        engine = create_engine(DATABASE_URI)
-        conn = engine.raw_connection()
+        conn = db.get_engine().raw_connection()
         return conn
     except Exception as e:
         print(f"Error connecting to DB: {e}")
@@ -48,8 +48,11 @@ const Dashboard = () => {
 
     // Analytics Logic
     const riskCounts = { 'At Risk': 0, 'Standard': 0, 'High Achiever': 0, 'Unknown': 0 };
+    // Profiles run with k > 3 split the middle into ranked 'Standard 1', 'Standard 2', ...
+    const isStandard = (type) => type === 'Standard' || /^Standard \d+$/.test(type || '');
     profiles.forEach(p => {
-        if (riskCounts[p.profile_type] !== undefined) riskCounts[p.profile_type]++;
+        if (isStandard(p.profile_type)) riskCounts['Standard']++;
+        else if (riskCounts[p.profile_type] !== undefined) riskCounts[p.profile_type]++;
         else riskCounts['Unknown']++;
     });
 
@@ -129,7 +132,7 @@ const Dashboard = () => {
                                                     color={
                                                         p.profile_type === 'At Risk' ? 'error' :
                                                         p.profile_type === 'High Achiever' ? 'success' :
-                                                        p.profile_type === 'Standard' ? 'primary' : 'default'
+                                                        isStandard(p.profile_type) ? 'primary' : 'default'
                                                     }
                                                     variant="soft"
                                                     sx={{ fontWeight: 500 }}